@@ -0,0 +1,273 @@
+"""Асинхронный путь чтения для ASGI-сервера.
+
+При ASYNC_READ_PATH GET-запросы к списку и карточкам рецептов, тегам и
+ингредиентам обрабатываются асинхронными представлениями: запросы к БД
+выполняются асинхронным ORM, и воркер, пока ждёт БД, обслуживает
+другие запросы. Ответы, включая ETag, 304 и кэш готового JSON,
+совпадают с ответами RecipesViewSet, TagsViewSet и IngredientsViewSet.
+Остальные методы и запросы, которые здесь не поддерживаются (другие
+форматы, курсорная пагинация, неверный токен, ошибки параметров),
+передаются этим представлениям.
+"""
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.filters import RecipeFilter
+from api.mixins import make_validators, rendered_cache_key
+from api.pagination import RecipePagination
+from api.serializers import RecipeListSerializer, TagSerializer
+from api.views import (IngredientsViewSet, RecipesViewSet, TagsViewSet,
+                       recipe_queryset)
+from recipes import versions
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Recipe, Tag
+from recipes.relations import get_relations
+
+renderer = JSONRenderer()
+
+LIST_ACTIONS = {'get': 'list', 'post': 'create'}
+DETAIL_ACTIONS = {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}
+
+
+def sync_view(viewset, basename, actions, detail):
+    # Как и роутер, подключает только действия, которые есть у viewset.
+    actions = {
+        method: action for method, action in actions.items()
+        if hasattr(viewset, action)
+    }
+    return sync_to_async(
+        viewset.as_view(actions, basename=basename, detail=detail)
+    )
+
+
+recipes_list_sync = sync_view(RecipesViewSet, 'recipes', LIST_ACTIONS, False)
+recipe_detail_sync = sync_view(
+    RecipesViewSet, 'recipes', DETAIL_ACTIONS, True
+)
+tags_list_sync = sync_view(TagsViewSet, 'tags', LIST_ACTIONS, False)
+tag_detail_sync = sync_view(TagsViewSet, 'tags', DETAIL_ACTIONS, True)
+ingredients_list_sync = sync_view(
+    IngredientsViewSet, 'ingredients', LIST_ACTIONS, False
+)
+
+
+def async_read_view(sync_handler):
+    """GET обрабатывается асинхронной функцией, остальное и случаи,
+    где она возвращает None, - синхронным представлением."""
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            response = None
+            if request.method == 'GET' and accepts_json(request):
+                user = await authenticate(request)
+                if user is not None:
+                    request.user = user
+                    response = await handler(request, *args, **kwargs)
+            if response is None:
+                return await sync_handler(request, *args, **kwargs)
+            patch_vary_headers(response, ('Accept',))
+            return response
+        # Как и представления DRF, токен не требует проверки CSRF.
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+def accepts_json(request):
+    if 'format' in request.GET:
+        return False
+    accept = request.headers.get('Accept', '*/*')
+    # С text/html DRF отдаёт браузерную версию API.
+    return 'text/html' not in accept and (
+        'application/json' in accept or '*/*' in accept
+    )
+
+
+async def authenticate(request):
+    """Пользователь по заголовку Authorization: Token <ключ>, как в
+    TokenAuthentication; None, если заголовок не подходит."""
+    header = request.headers.get('Authorization')
+    if header is None:
+        return AnonymousUser()
+    keyword, _, key = header.partition(' ')
+    if keyword.lower() != 'token' or not key or ' ' in key:
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+async def conditional_get(request, tables, render, relations=None):
+    """Проверка If-None-Match и If-Modified-Since как в
+    ConditionalGetMixin; render(etag) строит ответ."""
+    etag, last_modified = make_validators(
+        await versions.aget_versions(*tables), 'json', relations
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = await render(etag)
+        if response is None or response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def json_response(content):
+    return HttpResponse(content, content_type=renderer.media_type)
+
+
+async def cached_list(basename, etag, request, cached_query_param, load):
+    """Список из кэша готового JSON, как в RenderedCacheMixin."""
+    key = rendered_cache_key(basename, etag, request.GET, cached_query_param)
+    content = None if key is None else await cache.aget(key)
+    if content is None:
+        content = renderer.render(await load())
+        if key is not None:
+            await cache.aset(key, content, settings.RENDERED_CACHE_TTL)
+    return json_response(content)
+
+
+async def user_relations(user):
+    if user.is_anonymous:
+        return None
+    return await sync_to_async(get_relations)(user)
+
+
+def filter_recipes(request):
+    # Проверка формы фильтров обращается к БД за тегами.
+    filterset = RecipeFilter(
+        request.GET, queryset=recipe_queryset(), request=request
+    )
+    return filterset.qs if filterset.is_valid() else None
+
+
+def page_number(request):
+    page = request.GET.get('page', '1')
+    return int(page) if page.isdigit() and int(page) > 0 else None
+
+
+def page_link(request, page, pages):
+    if page < 1 or page > pages:
+        return None
+    url = request.build_absolute_uri()
+    if page == 1:
+        return remove_query_param(url, 'page')
+    return replace_query_param(url, 'page', page)
+
+
+@async_read_view(recipes_list_sync)
+async def recipes_list(request):
+    page = page_number(request)
+    # Курсорную пагинацию и порядок по рейтингу обрабатывает
+    # синхронный путь.
+    if (page is None or RecipePagination.cursor_query_param in request.GET
+            or 'ordering' in request.GET):
+        return None
+    relations = await user_relations(request.user)
+
+    async def render(etag):
+        queryset = await sync_to_async(filter_recipes)(request)
+        if queryset is None:
+            return None
+        page_size = RecipePagination.page_size
+        count = await queryset.acount()
+        pages = max(ceil(count / page_size), 1)
+        if page > pages:
+            return None
+        offset = (page - 1) * page_size
+        recipes = [
+            recipe async for recipe in queryset[offset:offset + page_size]
+        ]
+        return json_response(renderer.render({
+            'count': count,
+            'next': page_link(request, page + 1, pages),
+            'previous': page_link(request, page - 1, pages),
+            'results': RecipeListSerializer(recipes, many=True, context={
+                'request': request, 'relations': relations,
+            }).data,
+        }))
+    return await conditional_get(
+        request, RecipesViewSet.version_tables, render, relations
+    )
+
+
+@async_read_view(recipe_detail_sync)
+async def recipe_detail(request, pk):
+    relations = await user_relations(request.user)
+
+    async def render(etag):
+        try:
+            recipe = await recipe_queryset().aget(pk=pk)
+        except Recipe.DoesNotExist:
+            return None
+        return json_response(renderer.render(RecipeListSerializer(
+            recipe, context={'request': request, 'relations': relations}
+        ).data))
+    return await conditional_get(
+        request, RecipesViewSet.version_tables, render, relations
+    )
+
+
+@async_read_view(tags_list_sync)
+async def tags_list(request):
+    # Поиск по тегам (?search=) обрабатывает синхронный путь.
+    if request.GET:
+        return None
+
+    async def load():
+        return TagSerializer(
+            [tag async for tag in Tag.objects.all()], many=True
+        ).data
+
+    async def render(etag):
+        return await cached_list('tags', etag, request, None, load)
+    return await conditional_get(request, TagsViewSet.version_tables, render)
+
+
+@async_read_view(tag_detail_sync)
+async def tag_detail(request, pk):
+    async def render(etag):
+        try:
+            tag = await Tag.objects.aget(pk=pk)
+        except Tag.DoesNotExist:
+            return None
+        return json_response(renderer.render(TagSerializer(tag).data))
+    return await conditional_get(request, TagsViewSet.version_tables, render)
+
+
+@async_read_view(ingredients_list_sync)
+async def ingredients_list(request):
+    name = request.GET.get('name')
+
+    async def load():
+        # Индекс в памяти процесса; при первом поиске он читается из БД.
+        return await sync_to_async(ingredient_index.search)(name)
+
+    async def render(etag):
+        return await cached_list(
+            'ingredients', etag, request,
+            IngredientsViewSet.cached_query_param, load
+        )
+    return await conditional_get(
+        request, IngredientsViewSet.version_tables, render
+    )
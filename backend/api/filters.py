@@ -1,9 +1,13 @@
+from django.db.models import Exists, F, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
+    POPULAR = 'popular'
+
     tags = filters.ModelMultipleChoiceFilter(
         to_field_name='slug',
         field_name='tags__slug',
@@ -15,20 +19,45 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=((POPULAR, 'Популярные за всё время'),),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
 
     def get_is_favorited(self, queryset, _name, value):
-        if not value:
-            return queryset.exclude(favorites__user=self.request.user)
-        return queryset.filter(favorites__user=self.request.user)
+        return self.filter_related(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, _name, value):
-        if not value:
-            return queryset.exclude(cart__user=self.request.user)
-        return queryset.filter(cart__user=self.request.user)
+        return self.filter_related(queryset, ShoppingCart, value)
+
+    def filter_related(self, queryset, model, value):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if value else queryset
+        if value:
+            # Отбор от связей пользователя: рецепты читаются по первичному
+            # ключу, а не просмотром всех с проверкой каждого.
+            return queryset.filter(id__in=model.objects.filter(
+                user=user
+            ).values('recipe'))
+        return queryset.filter(~Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )))
+
+    def get_search(self, queryset, _name, value):
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, _name, value):
+        # Порядок по готовому рейтингу recipes.scores.
+        return queryset.order_by(
+            F('score__popular').desc(nulls_last=True), '-id'
+        )
 
 
 class IngredientFilter(filters.FilterSet):
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+URLS = ('/api/recipes/', '/api/recipes/?page=3', '/api/tags/',
+        '/api/ingredients/?name=мука')
+# Значение ASYNC_READ_PATH: по нему gunicorn.conf.py выбирает
+# приложение и класс воркеров.
+SERVERS = {'wsgi': 'False', 'asgi': 'True'}
+
+
+async def fetch(host, port, path, headers):
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = [f'GET {quote(path, safe="/?=&")} HTTP/1.1',
+             f'Host: {host}:{port}', 'Accept: application/json',
+             'Connection: close']
+    lines += [f'{name}: {value}' for name, value in headers.items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(response.split(b' ', 2)[1])
+
+
+async def load(address, paths, headers, concurrency, requests):
+    """Выполняет requests запросов в concurrency соединений;
+    возвращает (секунды, задержки, ошибки)."""
+    host, port = address
+    latencies = []
+    errors = 0
+    left = requests
+
+    async def client(number):
+        nonlocal left, errors
+        while left > 0:
+            left -= 1
+            path = paths[(left + number) % len(paths)]
+            started = time.perf_counter()
+            try:
+                status = await fetch(host, port, path, headers)
+            except OSError:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            errors += status not in (200, 304)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def wait_for_server(process, address, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError('Сервер завершился при запуске')
+        try:
+            asyncio.run(fetch(*address, '/api/tags/', {}))
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError('Сервер не запустился')
+
+
+class Command(BaseCommand):
+    """Сравнение синхронного (WSGI) и асинхронного (ASGI) пути чтения."""
+    help = ('Запускает gunicorn с синхронными воркерами и с воркерами '
+            'uvicorn (ASYNC_READ_PATH) на текущей БД и выводит число '
+            'запросов в секунду и задержки p50/p99')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument(
+            '--url', action='append', dest='urls',
+            help=f'Путь запроса (по умолчанию {", ".join(URLS)})'
+        )
+        parser.add_argument('--token', help='Токен пользователя')
+        parser.add_argument(
+            '--server', choices=SERVERS, action='append', dest='servers'
+        )
+        parser.add_argument('--bind', default='127.0.0.1:8765')
+
+    def handle(self, *args, **options):
+        bind = urlsplit(f'//{options["bind"]}')
+        host, port = bind.hostname, bind.port
+        paths = options['urls'] or URLS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        self.stdout.write(
+            f'{"server":<8}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}'
+            f'{"errors":>8}'
+        )
+        for name in options['servers'] or SERVERS:
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                 '--bind', options['bind'], '--workers',
+                 str(options['workers']), '--log-level', 'warning'],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, 'ASYNC_READ_PATH': SERVERS[name]},
+            )
+            try:
+                wait_for_server(process, (host, port))
+                # Прогрев: кэши и индексы процессов-воркеров.
+                asyncio.run(load((host, port), paths, headers,
+                                 options['workers'] * 4, len(paths) * 20))
+                seconds, latencies, errors = asyncio.run(load(
+                    (host, port), paths, headers, options['concurrency'],
+                    options['requests']
+                ))
+            finally:
+                process.terminate()
+                process.wait()
+            self.stdout.write(
+                f'{name:<8}{len(latencies) / seconds:>10.0f}'
+                f'{percentile(latencies, 0.5) * 1000:>10.1f}'
+                f'{percentile(latencies, 0.99) * 1000:>10.1f}{errors:>8}'
+            )
@@ -0,0 +1,170 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Exists, OuterRef
+
+from api.serializers import latest_recipes
+from recipes.models import (Favorite, IngredientsRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem, TableVersion, Tag)
+from recipes.search import search_recipes
+from recipes.versions import RECIPES
+from users.models import Subscription, User
+
+PAGE_SIZE = 6
+CURSOR_OFFSET = 1000
+# Небольшие справочные таблицы читаются целиком и без индекса.
+SMALL_TABLES = {'recipes_tag', 'recipes_tableversion'}
+# Просмотр таблицы; в SQLite просмотр в порядке индекса (SCAN ... USING
+# INDEX) - тоже обход всех строк, если таблица не отобрана условием.
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+    'sqlite': re.compile(
+        r'\bSCAN (?P<table>\w+)(?P<index> USING (?:COVERING )?INDEX \w+)?$'
+    ),
+}
+# Запросы без условия на рецепты: обход индекса сортировки для них
+# ожидаем, отмечается только просмотр без индекса.
+INDEX_WALKS = {'recipes-page', 'recipes-not-favorited'}
+
+
+def active_user(model):
+    return model.objects.values('user').annotate(
+        total=Count('id')
+    ).order_by('-total').values_list('user', flat=True).first()
+
+
+def hot_queries():
+    """Запросы горячих путей API: (название, queryset)."""
+    user = active_user(Favorite) or active_user(ShoppingCart)
+    follower = active_user(Subscription)
+    author = User.objects.order_by('-recipes_count').first()
+    # Курсор для страницы далеко от начала ленты: 1001-й рецепт или
+    # последний, если рецептов меньше.
+    count = Recipe.objects.count()
+    recipe = Recipe.objects.order_by('-created', '-id')[
+        min(count, CURSOR_OFFSET + 1) - 1
+    ] if count else None
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    page = list(Recipe.objects.values_list('id', flat=True)[:PAGE_SIZE])
+    authors = list(User.objects.filter(
+        following__user=follower
+    ).values_list('id', flat=True)[:PAGE_SIZE])
+    queries = (
+        ('recipes-page', Recipe.objects.select_related('author')[
+            PAGE_SIZE * 100:PAGE_SIZE * 101
+        ]),
+        ('recipes-by-author', Recipe.objects.filter(
+            author=author
+        )[:PAGE_SIZE]),
+        ('recipes-by-tags', Recipe.objects.filter(
+            tags__slug__in=tags
+        ).distinct()[:PAGE_SIZE]),
+        ('recipes-favorited', Recipe.objects.filter(
+            id__in=Favorite.objects.filter(user=user).values('recipe')
+        )[:PAGE_SIZE]),
+        ('recipes-not-favorited', Recipe.objects.filter(~Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        ))[:PAGE_SIZE]),
+        ('recipes-in-cart', Recipe.objects.filter(
+            id__in=ShoppingCart.objects.filter(user=user).values('recipe')
+        )[:PAGE_SIZE]),
+        ('recipes-search', search_recipes(
+            Recipe.objects.all(), 'рецепт'
+        )[:PAGE_SIZE]),
+        ('recipes-ingredients', IngredientsRecipe.objects.filter(
+            recipe_id__in=page
+        ).select_related('ingredients')),
+        ('recipes-tags', Recipe.tags.through.objects.filter(
+            recipe_id__in=page
+        ).select_related('tag')),
+        ('relations-favorites', Favorite.objects.filter(
+            user_id=user
+        ).order_by('recipe_id').values_list('recipe_id')),
+        ('relations-cart', ShoppingCart.objects.filter(
+            user_id=user
+        ).order_by('recipe_id').values_list('recipe_id')),
+        ('relations-following', Subscription.objects.filter(
+            user_id=follower
+        ).order_by('author_id').values_list('author_id')),
+        ('subscriptions-page', User.objects.filter(
+            following__user=follower
+        )[:PAGE_SIZE]),
+        ('subscriptions-recipes', latest_recipes(authors, 3)),
+        ('shopping-list', ShoppingListItem.objects.filter(
+            user_id=user
+        ).order_by('ingredient__name').values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+        )),
+        ('table-versions', TableVersion.objects.filter(table__in=[RECIPES])),
+    )
+    if recipe is None:
+        return queries
+    return queries + (
+        ('recipes-cursor', Recipe.objects.filter(
+            created__lte=recipe.created
+        ).order_by('-created', '-id')[:PAGE_SIZE + 1]),
+        ('cart-users', ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id')),
+    )
+
+
+def explain(queryset):
+    if hasattr(queryset, 'explain'):
+        return queryset.explain()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.explain_query_prefix()} {queryset.raw_query}',
+            queryset.params
+        )
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    """Проверка планов горячих запросов API."""
+    help = ('Выполняет EXPLAIN для горячих запросов API на текущих данных '
+            '(например, после seed_foodgram) и отмечает полные просмотры '
+            'таблиц')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных'
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершаться с ошибкой, если найден полный просмотр таблицы'
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f'СУБД {connection.vendor} не поддерживается')
+        if not Recipe.objects.exists():
+            raise CommandError('Нет данных, сначала запустите seed_foodgram')
+        # Подзапросы и CTE в плане тоже выглядят как просмотр.
+        tables = set(connection.introspection.table_names()) - SMALL_TABLES
+        flagged = []
+        for name, queryset in hot_queries():
+            plan = explain(queryset)
+            scans = sorted({
+                match['table'] for line in plan.splitlines()
+                for match in pattern.finditer(line.strip())
+                if match['table'] in tables and not (
+                    name in INDEX_WALKS and match.groupdict().get('index')
+                )
+            })
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: полный просмотр {", ".join(scans)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: ok')
+            if scans or options['verbose_plans']:
+                self.stdout.write(plan)
+        if flagged and options['fail']:
+            raise CommandError(
+                f'Полный просмотр таблиц в запросах: {", ".join(flagged)}'
+            )
@@ -1,16 +1,182 @@
 import csv
+import json
+import re
+import sys
+from collections import Counter
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from recipes import versions
+from recipes.ingredient_index import ingredient_index
 from recipes.models import Ingredient
 
+DEFAULT_PATH = 'static/data/ingredients.csv'
+FORMATS = ('csv', 'json')
+READ_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+INVALID_JSON_ERR_MSG = 'Некорректный JSON в файле'
+
+
+def read_csv(stream):
+    for row in csv.reader(stream):
+        yield row[:2] if len(row) >= 2 else None
+
+
+class JSONArrayReader:
+    """Потоковый разбор JSON-массива без загрузки файла целиком. Между
+    элементами массива допускается ровно одна запятая."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.buffer, self.position = '', 0
+
+    def next_char(self):
+        """Первый непробельный символ с текущей позиции (дочитывая файл)
+        или '' в конце файла."""
+        while True:
+            self.position = WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            self.buffer, self.position = self.stream.read(READ_CHUNK_SIZE), 0
+            if not self.buffer:
+                return ''
+
+    def decode(self):
+        try:
+            return self.decoder.raw_decode(self.buffer, self.position)
+        except json.JSONDecodeError:
+            return None, None
+
+    def next_item(self):
+        while True:
+            item, end = self.decode()
+            # Число в конце буфера может продолжаться в следующей части.
+            complete = end is not None and (
+                end < len(self.buffer) or not isinstance(item, (int, float))
+            )
+            chunk = '' if complete else self.stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                if end is None:
+                    raise CommandError(INVALID_JSON_ERR_MSG)
+                self.position = end
+                return item
+            self.buffer = self.buffer[self.position:] + chunk
+            self.position = 0
+
+    def __iter__(self):
+        if self.next_char() != '[':
+            raise CommandError('Ожидается JSON-массив ингредиентов')
+        self.position += 1
+        if self.next_char() == ']':
+            return
+        while True:
+            yield self.next_item()
+            char = self.next_char()
+            if char == ']':
+                return
+            if char != ',':
+                raise CommandError(INVALID_JSON_ERR_MSG)
+            self.position += 1
+            if self.next_char() in ('', ',', ']'):
+                raise CommandError(INVALID_JSON_ERR_MSG)
+
+
+def read_json(stream):
+    for item in JSONArrayReader(stream):
+        if isinstance(item, dict):
+            yield [item.get('name'), item.get('measurement_unit')]
+        else:
+            yield None
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
 
 class Command(BaseCommand):
     """Импорт ингредиентов в БД"""
-    help = 'Импорт ингредиентов в БД из .csv файла'
+    help = ('Импорт ингредиентов в БД из .csv или .json файла '
+            '(путь "-" читает stdin)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--update', action='store_true',
+            help=('Обновлять единицу измерения ингредиента с тем же '
+                  'названием вместо добавления новой записи')
+        )
 
     def handle(self, *args, **options):
-        with open('static/data/ingredients.csv', encoding='utf-8') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                Ingredient.objects.create(name=row[0], measurement_unit=row[1])
+        path = options['path']
+        file_format = options['format'] or (
+            Path(path).suffix.lstrip('.').lower() if path != '-' else 'csv'
+        )
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        self.counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        if path == '-':
+            self.load(sys.stdin, file_format, options)
+        else:
+            try:
+                with open(path, encoding='utf-8') as stream:
+                    self.load(stream, file_format, options)
+            except FileNotFoundError:
+                raise CommandError(f'Файл {path} не найден')
+        ingredient_index.invalidate()
+        if self.counts['inserted'] or self.counts['updated']:
+            versions.bump(versions.INGREDIENTS, versions.RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            'Добавлено: {inserted}, обновлено: {updated}, '
+            'пропущено: {skipped}'.format(**self.counts)
+        ))
+
+    @transaction.atomic
+    def load(self, stream, file_format, options):
+        rows = READERS[file_format](stream)
+        while batch := list(islice(rows, options['batch_size'])):
+            self.load_batch(batch, options['update'])
+
+    def load_batch(self, batch, update):
+        rows = {}
+        for row in batch:
+            if not row or not all(isinstance(value, str) for value in row):
+                self.counts['skipped'] += 1
+                continue
+            name, measurement_unit = (value.strip() for value in row)
+            if not name or not measurement_unit or (
+                (name, measurement_unit) in rows
+            ):
+                self.counts['skipped'] += 1
+                continue
+            rows[(name, measurement_unit)] = Ingredient(
+                name=name, measurement_unit=measurement_unit
+            )
+        existing = {}
+        for ingredient in Ingredient.objects.filter(
+            name__in={name for name, _ in rows}
+        ):
+            existing.setdefault(ingredient.name, []).append(ingredient)
+        units = Counter(name for name, _ in rows)
+        new, changed = [], []
+        for (name, measurement_unit), ingredient in rows.items():
+            same_name = existing.get(name, [])
+            if any(item.measurement_unit == measurement_unit
+                   for item in same_name):
+                self.counts['skipped'] += 1
+            elif update and len(same_name) == 1 and units[name] == 1:
+                same_name[0].measurement_unit = measurement_unit
+                changed.append(same_name[0])
+            else:
+                new.append(ingredient)
+        Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+        Ingredient.objects.bulk_update(changed, ('measurement_unit',))
+        self.counts['inserted'] += len(new)
+        self.counts['updated'] += len(changed)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import make_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создание уменьшенных копий изображений рецептов."""
+    help = ('Создаёт копии изображений, для которых их ещё нет '
+            '(с --all - для всех изображений)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии всех изображений'
+        )
+
+    def handle(self, *args, **options):
+        sources = set()
+        for image, source in Recipe.objects.exclude(image='').values_list(
+            'image', 'image_variants__source'
+        ).iterator():
+            if options['all'] or image != source:
+                sources.add(image)
+        updated = failed = 0
+        for image in sorted(sources):
+            try:
+                updated += make_variants(image, force=options['all'])
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'{image}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(sources) - failed}, рецептов: {updated}, '
+            f'ошибок: {failed}'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    """Пересборка лент подписок по подпискам пользователей."""
+    help = ('Пересобирает ленты подписок всех пользователей '
+            'или только указанных по id')
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        entries = rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты подписок пересобраны, записей: {entries}'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import index_recipes
+
+
+class Command(BaseCommand):
+    """Перестроение полнотекстового индекса рецептов."""
+    help = 'Перестраивает поисковый индекс всех рецептов'
+
+    def handle(self, *args, **options):
+        index_recipes()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
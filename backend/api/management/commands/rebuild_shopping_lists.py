@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild
+
+
+class Command(BaseCommand):
+    """Пересчёт сводных списков покупок по корзинам пользователей."""
+    help = ('Пересчитывает сводные списки покупок всех пользователей '
+            'или только указанных по id')
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        items = rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересчитаны, позиций: {items}'
+        ))
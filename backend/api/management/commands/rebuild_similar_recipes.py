@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similar import rebuild
+from recipes.tasks import rebuild_similar_recipes
+
+
+class Command(BaseCommand):
+    """Пересчёт похожих рецептов."""
+    help = ('Пересчитывает списки похожих рецептов для всех рецептов; '
+            'после изменения рецепта его список обновляется сам')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить пересчёт в очередь фоновых задач'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            rebuild_similar_recipes.enqueue()
+            self.stdout.write(
+                self.style.SUCCESS('Пересчёт поставлен в очередь')
+            )
+            return
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты пересчитаны, строк: {total}'
+        ))
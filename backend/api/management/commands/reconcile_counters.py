@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import reconcile
+from recipes.tasks import reconcile_counters
+
+
+class Command(BaseCommand):
+    """Сверка хранимых счётчиков с данными."""
+    help = ('Пересчитывает счётчики избранного, рецептов и подписчиков '
+            'и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить сверку в очередь фоновых задач'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            reconcile_counters.enqueue()
+            self.stdout.write(
+                self.style.SUCCESS('Сверка поставлена в очередь')
+            )
+            return
+        for counter, fixed in reconcile().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
@@ -0,0 +1,261 @@
+import io
+import random
+import time
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from recipes import versions
+from recipes.counters import reconcile as reconcile_counters
+from recipes.feed import rebuild as rebuild_feeds
+from recipes.models import (Favorite, Ingredient, IngredientsRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.scores import update as update_scores
+from recipes.search import index_recipes
+from recipes.shopping_list import rebuild as rebuild_shopping_lists
+from recipes.similar import rebuild as rebuild_similar
+from users.models import Subscription, User
+
+PLACEHOLDER_IMAGE = 'recipes/images/seed-placeholder.png'
+SYNTHETIC_INGREDIENTS = 2000
+
+
+class ZipfSampler:
+    """Выборка с распределением Ципфа: немногие элементы популярны."""
+
+    def __init__(self, rng, population, exponent):
+        self.rng = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)
+        ))
+
+    def sample(self, k=1):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=k
+        )
+
+    def sample_distinct(self, k):
+        k = min(k, len(self.population))
+        result = set()
+        while len(result) < k:
+            result.update(self.sample(k - len(result)))
+        return result
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочного тестирования."""
+    help = ('Заполняет БД пользователями, рецептами, избранным, списками '
+            'покупок и подписками с распределением популярности по Ципфу')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=10000)
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель распределения Ципфа')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.zipf = options['zipf']
+        self.prefix = f'seed{options["seed"]}_'
+
+        tags = self.stage('Тэги', self.create_tags, options['tags'])
+        ingredients = self.stage('Ингредиенты', self.get_ingredients)
+        users = self.stage('Пользователи', self.create_users,
+                           options['users'])
+        if not users:
+            raise CommandError('Нужен хотя бы один пользователь')
+        recipes = self.stage(
+            'Рецепты', self.create_recipes, options['recipes'], users,
+            tags, ingredients, options['ingredients_per_recipe'],
+        )
+        if recipes:
+            self.stage('Избранное', self.create_pairs, Favorite, 'user',
+                       'recipe', users, recipes, options['favorites'])
+            self.stage('Списки покупок', self.create_pairs, ShoppingCart,
+                       'user', 'recipe', users, recipes, options['carts'])
+        self.stage('Подписки', self.create_pairs, Subscription, 'user',
+                   'author', users, users, options['subscriptions'])
+        self.stage('Поисковый индекс', self.index)
+        self.stage('Сводные списки покупок', self.shopping_lists)
+        self.stage('Счётчики', self.counters)
+        # bulk_create не отправляет сигналы: производные данные, которые
+        # они поддерживают, пересобираются целиком. Оценки - после
+        # счётчиков, popular считается по favorites_count.
+        self.stage('Оценки рецептов', self.scores)
+        self.stage('Ленты подписок', self.feeds)
+        self.stage('Похожие рецепты', self.similar)
+        versions.bump(
+            versions.TAGS, versions.INGREDIENTS, versions.RECIPES,
+            versions.RECIPE_INGREDIENTS
+        )
+
+    def index(self):
+        index_recipes()
+        return Recipe.objects.values_list('id', flat=True)
+
+    def shopping_lists(self):
+        return range(rebuild_shopping_lists())
+
+    def counters(self):
+        return [
+            counter for counter, fixed in reconcile_counters().items()
+            if fixed
+        ]
+
+    def scores(self):
+        return range(update_scores(full=True))
+
+    def feeds(self):
+        return range(rebuild_feeds())
+
+    def similar(self):
+        return range(rebuild_similar())
+
+    def stage(self, title, func, *args):
+        started = time.monotonic()
+        result = func(*args)
+        self.stdout.write(
+            f'{title}: {len(result)} за {time.monotonic() - started:.1f} с'
+        )
+        return result
+
+    def bulk_create(self, model, objects, ignore_conflicts=False):
+        """Вставка пачками, не держа в памяти все объекты сразу."""
+        objects = iter(objects)
+        created = []
+        while batch := list(islice(objects, self.batch_size)):
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts
+                ))
+        return created
+
+    def create_tags(self, number):
+        existing = list(Tag.objects.values_list('id', flat=True))
+        missing = max(number - len(existing), 0)
+        tags = self.bulk_create(Tag, [
+            Tag(
+                name=f'{self.prefix}тэг {index}',
+                slug=f'{self.prefix}tag-{index}',
+                color=f'#{self.rng.randrange(0x1000000):06X}',
+            )
+            for index in range(len(existing), len(existing) + missing)
+        ], ignore_conflicts=True)
+        if tags and tags[0].pk is None:
+            return list(Tag.objects.values_list('id', flat=True))
+        return existing + [tag.pk for tag in tags]
+
+    def get_ingredients(self):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if ingredients:
+            return ingredients
+        self.bulk_create(Ingredient, [
+            Ingredient(name=f'ингредиент {index}', measurement_unit='г')
+            for index in range(SYNTHETIC_INGREDIENTS)
+        ])
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, number):
+        start = User.objects.filter(username__startswith=self.prefix).count()
+        password = make_password(None)
+        self.bulk_create(User, (
+            User(
+                username=f'{self.prefix}{index}',
+                email=f'{self.prefix}{index}@foodgram.test',
+                first_name='Пользователь',
+                last_name=str(index),
+                password=password,
+            )
+            for index in range(start, start + number)
+        ))
+        return list(User.objects.filter(
+            username__startswith=self.prefix
+        ).values_list('id', flat=True))
+
+    def placeholder_image(self):
+        if not default_storage.exists(PLACEHOLDER_IMAGE):
+            content = io.BytesIO()
+            Image.new('RGB', (600, 400), '#E0E0E0').save(content, 'PNG')
+            default_storage.save(
+                PLACEHOLDER_IMAGE, ContentFile(content.getvalue())
+            )
+        return PLACEHOLDER_IMAGE
+
+    def create_recipes(self, number, users, tags, ingredients,
+                       ingredients_per_recipe):
+        image = self.placeholder_image()
+        authors = ZipfSampler(self.rng, users, self.zipf)
+        popular_ingredients = ZipfSampler(self.rng, ingredients, self.zipf)
+        recipes = []
+        for start in range(0, number, self.batch_size):
+            size = min(self.batch_size, number - start)
+            with transaction.atomic():
+                batch = Recipe.objects.bulk_create(
+                    Recipe(
+                        author_id=author,
+                        name=f'Рецепт {start + index}',
+                        text='Сгенерированный рецепт',
+                        cooking_time=self.rng.randint(5, 180),
+                        image=image,
+                    )
+                    for index, author in enumerate(authors.sample(size))
+                )
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag)
+                    for recipe in batch
+                    for tag in self.rng.sample(
+                        tags, min(len(tags), self.rng.randint(1, 3))
+                    )
+                )
+                IngredientsRecipe.objects.bulk_create(
+                    IngredientsRecipe(
+                        recipe_id=recipe.pk,
+                        ingredients_id=ingredient,
+                        amount=self.rng.randint(1, 500),
+                    )
+                    for recipe in batch
+                    for ingredient in popular_ingredients.sample_distinct(
+                        ingredients_per_recipe
+                    )
+                )
+            recipes.extend(recipe.pk for recipe in batch)
+        return recipes
+
+    def create_pairs(self, model, left_field, right_field, left, right,
+                     number):
+        """Уникальные пары (активный пользователь, популярный объект)."""
+        number = min(number, len(left) * len(right))
+        active = ZipfSampler(self.rng, left, self.zipf)
+        popular = ZipfSampler(self.rng, right, self.zipf)
+        seen = set()
+        attempts = 0
+        while len(seen) < number and attempts < number * 20:
+            size = number - len(seen)
+            attempts += size
+            seen.update(
+                pair
+                for pair in zip(active.sample(size), popular.sample(size))
+                if pair[0] != pair[1] or model is not Subscription
+            )
+        pairs = list(seen)[:number]
+        self.bulk_create(model, (
+            model(**{f'{left_field}_id': first, f'{right_field}_id': second})
+            for first, second in pairs
+        ), ignore_conflicts=True)
+        return pairs
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.scores import update
+from recipes.tasks import update_recipe_scores
+
+
+class Command(BaseCommand):
+    """Пересчёт рейтингов популярных рецептов."""
+    help = ('Пересчитывает оценки рецептов с активностью за последние дни '
+            '(с --full - всех рецептов); запускается периодически')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать оценки всех рецептов'
+        )
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='Поставить пересчёт в очередь фоновых задач'
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue']:
+            update_recipe_scores.enqueue()
+            self.stdout.write(
+                self.style.SUCCESS('Пересчёт поставлен в очередь')
+            )
+            return
+        total = update(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценки пересчитаны, рецептов: {total}'
+        ))
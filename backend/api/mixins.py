@@ -1,6 +1,40 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import filters, mixins, viewsets
 
 from api.permissions import IsAdminOrReadOnly
+from recipes.ingredient_index import fold
+from recipes.relations import get_relations
+from recipes.versions import get_versions
+
+
+def make_validators(versions, renderer_format, relations=None):
+    """ETag и Last-Modified по версиям таблиц {table: (version, updated)}.
+    Если переданы связи пользователя, их отпечаток входит в ETag, а
+    Last-Modified не отдаётся."""
+    parts = [f'{table}.{version}' for table, (version, _) in versions.items()]
+    parts.append(renderer_format)
+    updated = [updated for _, updated in versions.values()]
+    last_modified = (
+        None if None in updated else int(max(updated).timestamp())
+    )
+    if relations is not None:
+        parts.append(relations.digest())
+        last_modified = None
+    return '"{}"'.format('-'.join(parts)), last_modified
+
+
+def rendered_cache_key(basename, etag, query_params, cached_query_param):
+    """Ключ готового JSON списка или None, если запрос не кэшируется."""
+    if not set(query_params) - {'format'} <= {cached_query_param}:
+        return None
+    query = fold(query_params.get(cached_query_param, '').strip())
+    if len(query) > settings.RENDERED_CACHE_PREFIX_LENGTH:
+        return None
+    return f'rendered:{basename}:{etag}:{query}'
 
 
 class CreateListDestroytViewSet(
@@ -13,3 +47,91 @@ class CreateListDestroytViewSet(
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('name',)
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve по версиям таблиц.
+
+    Ответ 304 отдаётся до выборки данных и работы сериализаторов. Если
+    ответ зависит от пользователя (user_dependent), в ETag авторизованного
+    пользователя входит отпечаток его связей, а Last-Modified не
+    отдаётся.
+    """
+    version_tables = ()
+    user_dependent = False
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_version_tables(self, request):
+        return self.version_tables
+
+    def get_validators(self, request):
+        relations = None
+        if self.user_dependent and request.user.is_authenticated:
+            relations = get_relations(request.user)
+        return make_validators(
+            get_versions(*self.get_version_tables(request)),
+            request.accepted_renderer.format, relations
+        )
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.make_response(
+                etag, handler, request, *args, **kwargs
+            )
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def make_response(self, etag, handler, request, *args, **kwargs):
+        return handler(request, *args, **kwargs)
+
+
+class RenderedCacheMixin(ConditionalGetMixin):
+    """Готовый JSON ответа list в кэше под ключом с версией таблицы.
+
+    Кэшируется список без параметров и с коротким значением
+    cached_query_param - частые префиксы при автодополнении. Изменение
+    таблицы меняет версию, а с ней ETag и ключ кэша.
+    """
+    cached_query_param = None
+
+    def get_cache_key(self, etag, request):
+        if (self.action != 'list'
+                or request.accepted_renderer.format != 'json'):
+            return None
+        return rendered_cache_key(
+            self.basename, etag, request.query_params,
+            self.cached_query_param
+        )
+
+    def make_response(self, etag, handler, request, *args, **kwargs):
+        key = self.get_cache_key(etag, request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        content = cache.get(key)
+        if content is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            cache.set(key, content, settings.RENDERED_CACHE_TTL)
+        return HttpResponse(
+            content, content_type=request.accepted_renderer.media_type
+        )
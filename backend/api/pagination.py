@@ -0,0 +1,102 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+MAX_CURSOR_PAGE_SIZE = 100
+
+
+class RecipePagination(PageNumberPagination):
+    """Пагинация рецептов.
+
+    По умолчанию - номера страниц (?page=), как ожидает фронтенд.
+    Параметр ?cursor= включает курсорную пагинацию по (created, id):
+    следующая страница выбирается условием по индексу, а не OFFSET,
+    без COUNT(*), и не сдвигается при добавлении новых рецептов.
+    Пустой cursor - первая страница, размер задаётся ?limit=.
+    """
+    cursor_query_param = 'cursor'
+    cursor_page_size_query_param = 'limit'
+    invalid_cursor_message = 'Неверный курсор'
+    # Поля ключа курсора: время и id для однозначного порядка.
+    cursor_fields = ('created', 'id')
+
+    def is_cursor_mode(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_mode(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_cursor_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        time_field, id_field = self.cursor_fields
+        queryset = queryset.order_by(f'-{time_field}', f'-{id_field}')
+        if cursor:
+            created, pk = self.decode_cursor(cursor)
+            # Условие created <= задаёт начало просмотра индекса.
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__lt': created})
+                | Q(**{time_field: created, f'{id_field}__lt': pk}),
+                **{f'{time_field}__lte': created},
+            )
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_cursor_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(
+                self.cursor_page_size_query_param, self.page_size
+            ))
+        except ValueError:
+            page_size = self.page_size
+        return min(max(page_size, 1), MAX_CURSOR_PAGE_SIZE)
+
+    def get_next_cursor_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def encode_cursor(self, obj):
+        created, pk = (getattr(obj, field) for field in self.cursor_fields)
+        value = f'{created.isoformat()}|{pk}'
+        return urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            created, pk = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split('|')
+            return datetime.fromisoformat(created), int(pk)
+        except (Base64Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class FeedPagination(RecipePagination):
+    """Курсорная пагинация ленты подписок по (created, recipe_id)
+    записей FeedEntry; первая страница - без параметра cursor."""
+    cursor_fields = ('created', 'recipe_id')
+
+    def is_cursor_mode(self, request):
+        return True
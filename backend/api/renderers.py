@@ -0,0 +1,74 @@
+import abc
+import csv
+import io
+import json
+from itertools import chain
+
+from rest_framework import renderers
+
+BOM = '\ufeff'
+
+
+class ShoppingCartRenderer(renderers.BaseRenderer, metaclass=abc.ABCMeta):
+    """Выгрузка списка покупок.
+
+    Сам список отдаётся потоком через stream(), render() используется
+    DRF только для ответов с ошибками.
+    """
+    charset = 'utf-8'
+
+    @abc.abstractmethod
+    def stream(self, rows):
+        """Части ответа для строк (название, единица, количество)."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield BOM
+        for name, measurement_unit, amount in rows:
+            yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def stream(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        yield BOM
+        for row in chain((self.header,), rows):
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows):
+        separator = '['
+        for name, measurement_unit, amount in rows:
+            yield separator + json.dumps({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            }, ensure_ascii=False)
+            separator = ',\n'
+        yield ']' if separator != '[' else '[]'
+
+
+SHOPPING_CART_RENDERERS = (
+    ShoppingCartTextRenderer,
+    ShoppingCartCSVRenderer,
+    ShoppingCartJSONRenderer,
+)
@@ -1,15 +1,33 @@
 import re
 
-from django.db.models import F
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from recipes import images, shopping_list
 from recipes.models import (Favorite, Ingredient, IngredientsRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.relations import get_relations
+from recipes.search import schedule_index
 from rest_framework import serializers
-from users.models import Subscription, User
+from users.models import User
 
 MIN_AMOUNT_ERR_MSG = "Значение должно быть больше 0"
 MIN_QTY_ERR_MSG = 'Укажите минимум 1 ингридиент'
+DUPLICATE_INGREDIENT_ERR_MSG = 'Ингредиенты не должны повторяться'
+UNKNOWN_INGREDIENT_ERR_MSG = 'Нет ингредиентов с id'
+UNKNOWN_TAG_ERR_MSG = 'Нет тегов с id'
+MAX_RECIPES_LIMIT = 100
+IMAGE_TOO_LARGE_ERR_MSG = (
+    f'Размер файла не должен превышать '
+    f'{settings.MAX_IMAGE_UPLOAD_SIZE // (1024 * 1024)} МБ'
+)
+IMAGE_DIMENSIONS_ERR_MSG = (
+    f'Изображение не должно быть больше {settings.MAX_IMAGE_SIDE} '
+    f'пикселей по стороне и {settings.MAX_IMAGE_PIXELS} пикселей всего'
+)
 
 
 class SignUpSerializer(UserCreateSerializer):
@@ -58,7 +76,19 @@ class SignUpSerializer(UserCreateSerializer):
         return user
 
 
-class UserSerializer(UserSerializer):
+class RelationsMixin:
+    """Связи текущего пользователя, загружаемые один раз на ответ."""
+
+    def has_relation(self, kind, pk):
+        relations = self.context.get('relations')
+        if relations is None:
+            relations = self.context['relations'] = get_relations(
+                self.context['request'].user
+            )
+        return relations.has(kind, pk)
+
+
+class UserSerializer(RelationsMixin, UserSerializer):
     """Данные зарегистрированных пользователей."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -71,15 +101,24 @@ class UserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
-        read_only_fields = ('is_subscribed',)
+        read_only_fields = ('is_subscribed', 'recipes_count',
+                            'followers_count')
 
     def get_is_subscribed(self, value):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            subscription = Subscription.objects.filter(author=value, user=user)
-            return subscription.exists()
-        return False
+        return self.has_relation('following', value.id)
+
+
+class AuthorSerializer(UserSerializer):
+    """Автор в ответах рецептов: без счётчиков, которые меняются при
+    подписках и не входят в версию рецептов."""
+
+    class Meta(UserSerializer.Meta):
+        fields = ('email', 'id', 'username', 'first_name', 'last_name',
+                  'is_subscribed')
+        read_only_fields = ('is_subscribed',)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -168,6 +207,20 @@ class IngredientsRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    """Позиция сводного списка покупок."""
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.IntegerField(source='total_amount')
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ('id', 'name', 'measurement_unit', 'amount',)
+
+
 class IngredientRecipeSerializer(serializers.ModelSerializer):
     amount = serializers.IntegerField(write_only=True)
     id = serializers.IntegerField(write_only=True)
@@ -180,105 +233,194 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(RelationsMixin, serializers.ModelSerializer):
     """Получение рецепта."""
     tags = TagSerializer(many=True)
-    author = UserSerializer()
-    ingredients = serializers.SerializerMethodField()
+    author = AuthorSerializer()
+    ingredients = IngredientsRecipeSerializer(source='recipe', many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'image_srcset',
+                  'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Favorite.objects.filter(
-            user=user,
-            recipe=obj
-        ).exists()
+        return self.has_relation('favorites', obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Recipe.objects.filter(
-            cart__user=user,
-            id=obj.id
-        ).exists()
+        return self.has_relation('cart', obj.id)
+
+    def get_image_srcset(self, obj):
+        return images.image_srcset(obj, self.context.get('request'))
+
+
+class PantryRecipeSerializer(RecipeListSerializer):
+    """Рецепт в подборе по продуктам: сколько ингредиентов совпало и
+    каких не хватает."""
+    matched = serializers.SerializerMethodField()
+    missing = serializers.SerializerMethodField()
+
+    class Meta(RecipeListSerializer.Meta):
+        fields = RecipeListSerializer.Meta.fields + ('matched', 'missing')
+
+    def get_matched(self, obj):
+        return self.context['matched'][obj.id]
+
+    def get_missing(self, obj):
+        pantry = self.context['pantry']
+        return IngredientsRecipeSerializer(
+            [row for row in obj.recipe.all()
+             if row.ingredients_id not in pantry],
+            many=True
+        ).data
+
+
+class ImageLimitsMixin:
+    """Ограничения размера файла и изображения. Размеры берутся из
+    заголовка, который Pillow читает при проверке файла, до
+    декодирования пикселей."""
+
+    def to_internal_value(self, data):
+        image = super().to_internal_value(data)
+        if image.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise serializers.ValidationError(IMAGE_TOO_LARGE_ERR_MSG)
+        width, height = image.image.size
+        if (max(width, height) > settings.MAX_IMAGE_SIDE
+                or width * height > settings.MAX_IMAGE_PIXELS):
+            raise serializers.ValidationError(IMAGE_DIMENSIONS_ERR_MSG)
+        return image
+
+
+class RecipeImageField(ImageLimitsMixin, serializers.ImageField):
+    """Изображение, загруженное файлом."""
+
+
+class RecipeBase64ImageField(ImageLimitsMixin, Base64ImageField):
+    """Изображение в base64; длина строки проверяется до декодирования."""
+
+    def to_internal_value(self, data):
+        # Каждые 4 символа base64 кодируют 3 байта.
+        if isinstance(data, str) and (
+            len(data) // 4 * 3 > settings.MAX_IMAGE_UPLOAD_SIZE
+        ):
+            raise serializers.ValidationError(IMAGE_TOO_LARGE_ERR_MSG)
+        return super().to_internal_value(data)
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Загрузка изображения рецепта файлом."""
+    image = RecipeImageField()
 
-    def get_ingredients(self, obj):
-        return obj.ingredients.values(
-            'id', 'name', 'measurement_unit', amount=F('ingredient__amount'))
+    class Meta:
+        model = Recipe
+        fields = ('image',)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Создание рецепта."""
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
     ingredients = IngredientRecipeSerializer(many=True,)
-    image = Base64ImageField()
+    image = RecipeBase64ImageField()
 
     class Meta:
         model = Recipe
         fields = ('author', 'ingredients', 'tags', 'image', 'name', 'text',
                   'cooking_time')
 
+    def validate_tags(self, data):
+        tags = list(dict.fromkeys(data))
+        missing = set(tags) - set(Tag.objects.filter(
+            id__in=tags
+        ).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                f'{UNKNOWN_TAG_ERR_MSG}: '
+                f'{", ".join(map(str, sorted(missing)))}'
+            )
+        return tags
+
     def validate_ingredients(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        if ingredients == []:
+        if not data:
             raise serializers.ValidationError(MIN_QTY_ERR_MSG)
-        for ingredient in ingredients:
-            if int(ingredient['amount']) <= 0:
+        amounts = {}
+        for ingredient in data:
+            if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(MIN_AMOUNT_ERR_MSG)
-        return data
+            if ingredient['id'] in amounts:
+                raise serializers.ValidationError(DUPLICATE_INGREDIENT_ERR_MSG)
+            amounts[ingredient['id']] = ingredient['amount']
+        missing = amounts.keys() - set(Ingredient.objects.filter(
+            id__in=amounts
+        ).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                f'{UNKNOWN_INGREDIENT_ERR_MSG}: '
+                f'{", ".join(map(str, sorted(missing)))}'
+            )
+        return amounts
+
+    def set_ingredients(self, recipe, amounts, created=False):
+        """Приводит ингредиенты рецепта к {ingredient_id: amount}:
+        добавляет, изменяет и удаляет только отличающиеся строки.
+        Возвращает прежние количества."""
+        # Для рецепта из RecipesViewSet строки уже загружены prefetch.
+        rows = {} if created else {
+            row.ingredients_id: row for row in recipe.recipe.all()
+        }
+        changed = [
+            IngredientsRecipe(pk=row.pk, amount=amounts[pk])
+            for pk, row in rows.items()
+            if pk in amounts and row.amount != amounts[pk]
+        ]
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(recipe=recipe, ingredients_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in rows
+        )
+        IngredientsRecipe.objects.bulk_update(changed, ('amount',))
+        removed = [row.pk for pk, row in rows.items() if pk not in amounts]
+        if removed:
+            IngredientsRecipe.objects.filter(pk__in=removed).delete()
+        return {pk: row.amount for pk, row in rows.items()}
 
+    @transaction.atomic
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
+        amounts = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags_data)
-        for ingredient in ingredients_data:
-            IngredientsRecipe.objects.get_or_create(
-                recipe=recipe,
-                ingredients_id=ingredient.get('id'),
-                amount=ingredient.get('amount')
-            )
-        recipe.is_favorited = False
-        recipe.is_in_shopping_cart = False
-        recipe.save()
+        recipe.tags.add(*tags_data)
+        self.set_ingredients(recipe, amounts, created=True)
+        schedule_index([recipe.id])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        amounts = validated_data.pop('ingredients', None)
+        tags_data = validated_data.pop('tags', None)
         instance.image = validated_data.get('image', instance.image)
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time
         )
-        instance.tags.clear()
-        tags_data = self.initial_data.get('tags')
-        instance.tags.set(tags_data)
-        IngredientsRecipe.objects.filter(recipe=instance).all().delete()
-        for ingredient in validated_data.get('ingredients'):
-            ingredient_amount_obj = IngredientsRecipe.objects.create(
-                recipe=instance,
-                ingredients_id=ingredient.get('id'),
-                amount=ingredient.get('amount')
-            )
-            ingredient_amount_obj.save()
         instance.save()
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        if amounts is not None:
+            old_amounts = self.set_ingredients(instance, amounts)
+            if old_amounts != amounts:
+                shopping_list.update_recipe(instance, old_amounts, amounts)
+        schedule_index([instance.id])
         return instance
 
     def to_representation(self, instance):
+        # Теги и ингредиенты только что записаны: рецепт читается
+        # заново с теми же select_related и prefetch, что и в списке.
+        instance = self.context['view'].get_queryset().get(pk=instance.pk)
         serializer = RecipeListSerializer(
             instance,
             context=self.context
@@ -286,31 +428,91 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
+def latest_recipes(author_ids, limit=None):
+    """Последние limit рецептов каждого автора одним запросом."""
+    queryset = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id', 'name', 'image', 'cooking_time', 'author_id'
+    )
+    if limit is None:
+        return queryset.order_by('author_id', *Recipe._meta.ordering)
+    # Фильтр по оконной функции в Django 4.1 недоступен, поэтому
+    # запрос с ROW_NUMBER() оборачивается в подзапрос.
+    sql, params = queryset.annotate(row_number=Window(
+        RowNumber(),
+        partition_by=F('author_id'),
+        order_by=(F('created').desc(), F('id').desc()),
+    )).order_by().query.sql_with_params()
+    row_number = connection.ops.quote_name('row_number')
+    return Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) AS recipes WHERE {row_number} <= %s '
+        f'ORDER BY author_id, {row_number}',
+        (*params, limit)
+    )
+
+
+class RecipesLimitSerializer(serializers.Serializer):
+    """Параметр recipes_limit списка подписок."""
+    recipes_limit = serializers.IntegerField(
+        min_value=0, max_value=MAX_RECIPES_LIMIT, required=False
+    )
+
+
+class PantrySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по продуктам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=settings.PANTRY_MAX_INGREDIENTS
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, default=settings.PANTRY_MAX_MISSING
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    """Список id для пакетного добавления или удаления."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=settings.BATCH_MAX_IDS
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+    """Загружает рецепты всех авторов страницы одним запросом."""
+
+    def to_representation(self, data):
+        authors = list(data)
+        recipes = {author.id: [] for author in authors}
+        for recipe in latest_recipes(
+            recipes, self.context.get('recipes_limit')
+        ):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes[author.id]
+        return super().to_representation(authors)
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Возвращает пользователей, на которых подписан текущий пользователь.
        В выдачу добавляются рецепты."""
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
     is_subscribed = serializers.BooleanField(default=True)
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
+        read_only_fields = ('recipes_count', 'followers_count')
+        list_serializer_class = SubscriptionListSerializer
 
     def get_recipes(self, value):
-        queryset = Recipe.objects.filter(author=value)
-        if not self.context.get('recipes_limit'):
-            recipes = queryset
+        if hasattr(value, 'latest_recipes'):
+            recipes = value.latest_recipes
         else:
-            recipes = queryset[:int(self.context['recipes_limit'])]
+            recipes = latest_recipes(
+                [value.id], self.context.get('recipes_limit')
+            )
         return FavoritedSerializer(recipes, many=True).data
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Subscription.objects.filter(user=user, author=obj).exists()
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
 from api.views import (CustomUserViewSet, IngredientsViewSet, RecipesViewSet,
                        TagsViewSet)
 
@@ -13,8 +15,19 @@ router_v1.register(r'tags', TagsViewSet, basename='tags')
 router_v1.register(r'ingredients', IngredientsViewSet, basename='ingredients')
 router_v1.register(r'recipes', RecipesViewSet, basename='recipes')
 
+async_urlpatterns = [
+    path('recipes/', async_views.recipes_list),
+    path('recipes/<int:pk>/', async_views.recipe_detail),
+    path('tags/', async_views.tags_list),
+    path('tags/<int:pk>/', async_views.tag_detail),
+    path('ingredients/', async_views.ingredients_list),
+]
+
 urlpatterns = [
 
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(router_v1.urls)),
 ]
+
+if settings.ASYNC_READ_PATH:
+    urlpatterns = async_urlpatterns + urlpatterns
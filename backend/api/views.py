@@ -1,28 +1,95 @@
-import csv
-
+from api.exceptions import RequestEntityTooLarge
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import CreateListDestroytViewSet
+from api.mixins import (ConditionalGetMixin, CreateListDestroytViewSet,
+                        RenderedCacheMixin)
+from api.pagination import FeedPagination, RecipePagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrAdminOrReadOnly
-from api.serializers import (FavoritedSerializer, IngredientSerializer,
-                             RecipeCreateSerializer, RecipeListSerializer,
+from api.renderers import SHOPPING_CART_RENDERERS
+from api.serializers import (BatchSerializer, FavoritedSerializer,
+                             IngredientSerializer, PantryRecipeSerializer,
+                             PantrySerializer, RecipeCreateSerializer,
+                             RecipeImageSerializer, RecipeListSerializer,
+                             RecipesLimitSerializer,
+                             ShoppingListItemSerializer,
                              SubscriptionSerializer, TagSerializer,
                              UserSerializer)
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, IngredientsRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes import batch, versions
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, FeedEntry, Ingredient, IngredientsRecipe,
+                            Recipe, RecipeScore, ShoppingListItem,
+                            SimilarRecipe, Tag)
+from recipes.pantry import pantry_index
+from recipes.shopping_list import add_to_cart, remove_from_cart
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.pagination import (LimitOffsetPagination,
                                        PageNumberPagination)
+from rest_framework.parsers import FileUploadParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from users.models import Subscription, User
 
+FAVORITE_ERRORS = {
+    'POST': 'Вы уже добавили этот рецепт в избранное',
+    'DELETE': 'Вы еще не добавили этот рецепт в избранное',
+}
+SHOPPING_CART_ERRORS = {
+    'POST': 'Рецепт уже добавлен в списко покупок',
+    'DELETE': 'Рецепт в корзине отсутствует',
+}
+SUBSCRIBE_ERRORS = {
+    'POST': ('Вы уже подписаны на этого автора или '
+             'пытаетеcь подписаться на самого себя'),
+    'DELETE': 'Вы не подписаны на этого автора',
+}
+NOT_FOUND_ERROR = 'Не найдено.'
+BATCH_STATUSES = {
+    batch.CREATED: status.HTTP_201_CREATED,
+    batch.DELETED: status.HTTP_204_NO_CONTENT,
+    batch.UNCHANGED: status.HTTP_400_BAD_REQUEST,
+    batch.SELF: status.HTTP_400_BAD_REQUEST,
+    batch.NOT_FOUND: status.HTTP_404_NOT_FOUND,
+}
+
+
+def batch_response(request, add, remove, errors):
+    """Пакетное добавление (POST) или удаление (DELETE) по {"ids": [...]}:
+    для каждого id статус и ошибка, как в ответе на запрос с одним
+    объектом."""
+    params = BatchSerializer(data=request.data)
+    params.is_valid(raise_exception=True)
+    change = add if request.method == 'POST' else remove
+    items = []
+    for pk, result in change(
+        request.user, params.validated_data['ids']
+    ).items():
+        item = {'id': pk, 'status': BATCH_STATUSES[result]}
+        if result == batch.NOT_FOUND:
+            item['errors'] = NOT_FOUND_ERROR
+        elif result in (batch.UNCHANGED, batch.SELF):
+            item['errors'] = errors[request.method]
+        items.append(item)
+    return Response(items)
+
+
+def recipe_queryset():
+    """Рецепты со всем, что нужно RecipeListSerializer."""
+    return Recipe.objects.select_related('author').prefetch_related(
+        'tags',
+        Prefetch(
+            'recipe',
+            queryset=IngredientsRecipe.objects.select_related('ingredients')
+        ),
+    )
+
 
 class CustomUserViewSet(UserViewSet):
     """Представление пользователями и подписками на авторов."""
@@ -35,53 +102,58 @@ class CustomUserViewSet(UserViewSet):
             permission_classes=[IsAuthenticated],
             pagination_class=LimitOffsetPagination)
     def subscriptions(self, request, pk=None):
+        params = RecipesLimitSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
         authors = User.objects.filter(following__user=request.user)
-        recipes_limit = request.query_params.get('recipes_limit')
         paginator = LimitOffsetPagination()
         result_page = paginator.paginate_queryset(authors, request)
         serializer = SubscriptionSerializer(
             result_page, many=True, context={
                 'current_user': request.user,
-                'recipes_limit': recipes_limit
+                'recipes_limit': params.validated_data.get('recipes_limit')
             }
         )
         return paginator.get_paginated_response(serializer.data)
 
     @action(methods=['post', 'delete'], detail=True,
             permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def subscribe(self, request, id):
-        response_errors = {
-            'POST': ('Вы уже подписаны на этого автора или '
-                     'пытаетеcь подписаться на самого себя'),
-            'DELETE': 'Вы не подписаны на этого автора',
-        }
         author = get_object_or_404(User, id=id)
         user = request.user
         subscription = Subscription.objects.filter(author=author, user=user)
-        is_subscribed = bool(subscription)
-        if request.method == 'POST' and author != user and not is_subscribed:
+        if (request.method == 'POST' and author != user
+                and not subscription.exists()):
             subscription = Subscription(author=author, user=user)
             subscription.save()
             request = self.request
             context = {'request': request}
             serializer = SubscriptionSerializer(author, context=context,)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE' and is_subscribed:
-            subscription.delete()
+        if request.method == 'DELETE' and subscription.delete()[0]:
             return Response(status=status.HTTP_204_NO_CONTENT)
-        response = {'errors': response_errors[request.method]}
+        response = {'errors': SUBSCRIBE_ERRORS[request.method]}
         return Response(response, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['post', 'delete'], detail=False, url_path='subscribe',
+            permission_classes=[IsAuthenticated])
+    def subscribe_batch(self, request):
+        """Подписка на авторов {"ids": [...]} или отписка от них."""
+        return batch_response(
+            request, batch.subscribe, batch.unsubscribe, SUBSCRIBE_ERRORS
+        )
+
 
-class TagsViewSet(CreateListDestroytViewSet):
+class TagsViewSet(RenderedCacheMixin, CreateListDestroytViewSet):
     """Тэги."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
+    version_tables = (versions.TAGS,)
 
 
-class IngredientsViewSet(CreateListDestroytViewSet):
+class IngredientsViewSet(RenderedCacheMixin, CreateListDestroytViewSet):
     """Ингридиенты."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -89,15 +161,37 @@ class IngredientsViewSet(CreateListDestroytViewSet):
     filter_backends = (DjangoFilterBackend,)
     pagination_class = None
     filterset_class = IngredientFilter
+    version_tables = (versions.INGREDIENTS,)
+    cached_query_param = 'name'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(self.search, request)
+
+    def search(self, request):
+        return Response(
+            ingredient_index.search(request.query_params.get('name'))
+        )
 
 
-class RecipesViewSet(ModelViewSet):
+class RecipesViewSet(ConditionalGetMixin, ModelViewSet):
     """Рецепты."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeListSerializer
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+    version_tables = (versions.RECIPES,)
+    user_dependent = True
+
+    def get_queryset(self):
+        return recipe_queryset()
+
+    def get_version_tables(self, request):
+        # Порядок по популярности меняется при пересчёте рейтингов.
+        if request.query_params.get('ordering') == RecipeFilter.POPULAR:
+            return self.version_tables + (versions.SCORES,)
+        return self.version_tables
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -112,69 +206,187 @@ class RecipesViewSet(ModelViewSet):
 
     @action(methods=['post', 'delete'], detail=True,
             permission_classes=[IsAuthenticated])
+    @transaction.atomic
     def favorite(self, request, pk=None):
-        response_errors = {
-            'POST': 'Вы уже добавили этот рецепт в избранное',
-            'DELETE': 'Вы еще не добавили этот рецепт в избранное',
-        }
         user = self.request.user
         recipe = get_object_or_404(Recipe, pk=pk)
         in_favorite = Favorite.objects.filter(user=user, recipe=recipe)
-        if request.method == 'POST' and not in_favorite:
+        if request.method == 'POST' and not in_favorite.exists():
             favorite = Favorite.objects.create(user=user, recipe=recipe)
             serializer = FavoritedSerializer(favorite.recipe)
             return Response(data=serializer.data,
                             status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE' and in_favorite:
-            in_favorite.delete()
+        if request.method == 'DELETE' and in_favorite.delete()[0]:
             return Response(status=status.HTTP_204_NO_CONTENT)
-        response = {'errors': response_errors[request.method]}
+        response = {'errors': FAVORITE_ERRORS[request.method]}
         return Response(response, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['post', 'delete'], detail=False, url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def favorite_batch(self, request):
+        """Добавление рецептов {"ids": [...]} в избранное или удаление
+        из него."""
+        return batch_response(
+            request, batch.add_favorites, batch.remove_favorites,
+            FAVORITE_ERRORS
+        )
+
     @action(detail=True, methods=["post", "delete"],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk=None):
-        response_errors = {
-            'POST': 'Рецепт уже добавлен в списко покупок',
-            'DELETE': 'Рецепт в корзине отсутствует',
-        }
         recipe = get_object_or_404(Recipe, pk=pk)
-        in_shopping_cart = ShoppingCart.objects.filter(
-            user=self.request.user,
-            recipe=recipe
-        )
-        if request.method == 'POST' and not in_shopping_cart:
-            shopping_cart = ShoppingCart.objects.create(user=self.request.user,
-                                                        recipe=recipe)
-            serializer = FavoritedSerializer(shopping_cart.recipe)
+        user = self.request.user
+        if request.method == 'POST' and add_to_cart(user, recipe):
+            serializer = FavoritedSerializer(recipe)
             return Response(
                 data=serializer.data,
                 status=status.HTTP_201_CREATED
             )
-        if request.method == 'DELETE' and in_shopping_cart:
-            in_shopping_cart.delete()
+        if request.method == 'DELETE' and remove_from_cart(user, recipe):
             return Response(status=status.HTTP_204_NO_CONTENT)
-        response = {'errors': response_errors[request.method]}
+        response = {'errors': SHOPPING_CART_ERRORS[request.method]}
         return Response(response, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['post', 'delete'], detail=False,
+            url_path='shopping_cart', permission_classes=[IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        """Добавление рецептов {"ids": [...]} в корзину или удаление из
+        неё."""
+        return batch_response(
+            request, batch.add_to_cart, batch.remove_from_cart,
+            SHOPPING_CART_ERRORS
+        )
+
     @action(methods=['get'], detail=False,
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь, от новых
+        к старым; страницы - по курсору из ссылки next."""
+        entries = self.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user).prefetch_related(
+                Prefetch('recipe', queryset=recipe_queryset())
+            )
+        )
+        serializer = RecipeListSerializer(
+            [entry.recipe for entry in entries], many=True,
+            context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=False,
+            pagination_class=PageNumberPagination)
+    def trending(self, request):
+        """Популярные за последние дни рецепты по готовому рейтингу."""
+        scores = self.paginate_queryset(
+            RecipeScore.objects.filter(trending__gt=0).order_by(
+                '-trending', '-recipe_id'
+            ).prefetch_related(Prefetch('recipe', queryset=recipe_queryset()))
+        )
+        serializer = RecipeListSerializer(
+            [score.recipe for score in scores], many=True,
+            context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=False,
+            pagination_class=PageNumberPagination)
+    def pantry(self, request):
+        """Что приготовить из продуктов ?ingredients=1&ingredients=2:
+        рецепты, в которых не хватает не больше max_missing ингредиентов,
+        по индексу в памяти процесса."""
+        params = PantrySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        pantry = set(params.validated_data['ingredients'])
+        page = self.paginate_queryset(pantry_index.match(
+            pantry, params.validated_data['max_missing']
+        ))
+        recipes = recipe_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        serializer = PantryRecipeSerializer(
+            [recipes[recipe_id] for recipe_id, _, _ in page
+             if recipe_id in recipes],
+            many=True, context={
+                **self.get_serializer_context(),
+                'pantry': pantry,
+                'matched': {
+                    recipe_id: matched for recipe_id, matched, _ in page
+                },
+            }
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=True, pagination_class=None)
+    def similar(self, request, pk=None):
+        """Рецепты, похожие по ингредиентам и тегам, из готовых списков
+        ближайших соседей."""
+        neighbours = list(SimilarRecipe.objects.filter(
+            recipe_id=pk
+        ).order_by('-score', 'similar_id').prefetch_related(
+            Prefetch('similar', queryset=recipe_queryset())
+        ))
+        if not neighbours:
+            get_object_or_404(Recipe, pk=pk)
+        serializer = RecipeListSerializer(
+            [neighbour.similar for neighbour in neighbours], many=True,
+            context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(methods=['put'], detail=True,
+            parser_classes=(MultiPartParser, FileUploadParser))
+    def image(self, request, pk=None):
+        """Замена изображения рецепта: multipart/form-data с полем image
+        или тело запроса с файлом и заголовком Content-Disposition.
+        Файл читается частями во временный файл, а не в память."""
+        recipe = self.get_object()
+        # Размер проверяется по заголовку, до чтения тела запроса.
+        length = request.META.get('CONTENT_LENGTH', '')
+        if length.isdigit() and int(length) > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise RequestEntityTooLarge()
+        image = request.data.get('image', request.data.get('file'))
+        if image is not None and image.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise RequestEntityTooLarge()
+        serializer = RecipeImageSerializer(
+            recipe, data={'image': image},
+            context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated],
+            renderer_classes=SHOPPING_CART_RENDERERS)
     def download_shopping_cart(self, request):
-        user = self.request.user
-        if user.is_anonymous:
-            return Response(status=status.HTTP_401_UNAUTHORIZED)
-        ingredients = IngredientsRecipe.objects.filter(
-            recipe__cart__user=request.user
-        ).values(
-            'ingredients__name', 'ingredients__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount')).values_list(
-            'ingredients__name', 'ingredients__measurement_unit',
-            'ingredient_amount')
-        response = HttpResponse(content_type='text/txt')
-        response['Content-Disposition'] = ('attachment;'
-                                           'filename="Shoppingcart.txt"')
-        response.write(u'\ufeff'.encode('utf8'))
-        writer = csv.writer(response)
-        for item in list(ingredients):
-            writer.writerow(item)
+        """Список покупок в формате ?format=txt|csv|json."""
+        ingredients = self.shopping_list_items(request.user).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
+        )
         return response
+
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated], pagination_class=None)
+    def shopping_list(self, request):
+        """Текущий сводный список покупок."""
+        serializer = ShoppingListItemSerializer(
+            self.shopping_list_items(request.user).select_related(
+                'ingredient'
+            ),
+            many=True
+        )
+        return Response(serializer.data)
+
+    def shopping_list_items(self, user):
+        return ShoppingListItem.objects.filter(user=user).order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        )
@@ -0,0 +1,40 @@
+"""Прогрев кэшей при старте воркера.
+
+Строит индекс ингредиентов в памяти процесса и кладёт в кэш готовые
+ответы списков тэгов и ингредиентов, в том числе для префиксов из одной
+буквы, чтобы первый запрос после деплоя не собирал их с нуля.
+"""
+import logging
+from asyncio import iscoroutinefunction
+
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from recipes.ingredient_index import fold, ingredient_index
+
+logger = logging.getLogger(__name__)
+
+
+def get(path, params=None):
+    request = RequestFactory().get(
+        path, params, HTTP_ACCEPT='application/json'
+    )
+    view = resolve(path).func
+    # При ASYNC_READ_PATH списки обслуживают асинхронные представления.
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    return view(request)
+
+
+def warm_up():
+    try:
+        get(reverse('api:tags-list'))
+        path = reverse('api:ingredients-list')
+        get(path)
+        for letter in sorted({
+            fold(entry['name'])[:1] for entry in ingredient_index.search()
+        }):
+            get(path, {'name': letter})
+    except Exception:
+        logger.exception('Не удалось прогреть кэш')
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
     'rest_framework.authtoken',
     'rest_framework',
     'django_filters',
@@ -150,6 +151,84 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+# Автодополнение ингредиентов: максимум результатов поиска по префиксу
+# и время жизни индекса в памяти процесса (в секундах)
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_INDEX_TTL = 300
+
+# Кэш должен быть общим для всех воркеров: связи пользователя и готовые
+# ответы сбрасываются в кэше того процесса, который обработал запрос.
+# По умолчанию - redis из docker-compose; LocMemCache годится только для
+# одного процесса (тесты).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.redis.RedisCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='redis://redis:6379'),
+    }
+}
+
+# Время жизни кэша избранного, корзины и подписок пользователя (в секундах)
+RELATIONS_CACHE_TTL = 600
+
+# Готовые ответы справочников (тэги, ингредиенты): время жизни в кэше
+# и максимальная длина префикса ?name=, для которой ответ кэшируется
+RENDERED_CACHE_TTL = 24 * 60 * 60
+RENDERED_CACHE_PREFIX_LENGTH = 3
+
+# Лента подписок: число последних рецептов в ленте пользователя и
+# сколько лишних записей может накопиться до очистки
+FEED_MAX_ENTRIES = 500
+FEED_TRIM_SLACK = 50
+
+# Рейтинги рецептов: веса избранного и корзины, окно и период
+# полураспада оценки "популярные за неделю"
+POPULARITY_FAVORITE_WEIGHT = 2
+POPULARITY_CART_WEIGHT = 1
+TRENDING_WINDOW_DAYS = 7
+TRENDING_HALF_LIFE_HOURS = 48
+
+# Похожие рецепты: число соседей рецепта, с какого числа рецептов
+# ингредиент считается слишком частым для поиска кандидатов, вес
+# совпадения тегов и сколько секунд кэшируются частоты ингредиентов
+SIMILAR_RECIPES_TOP_K = 12
+SIMILAR_RECIPES_MAX_POSTING = 2000
+SIMILAR_RECIPES_TAG_WEIGHT = 0.2
+SIMILAR_RECIPES_FREQUENCIES_TTL = 3600
+
+# Подбор рецептов по продуктам: как часто процесс сверяет версию индекса
+# (в секундах), сколько ингредиентов может не хватать по умолчанию и
+# сколько продуктов можно передать
+PANTRY_INDEX_CHECK_INTERVAL = 5
+PANTRY_MAX_MISSING = 3
+PANTRY_MAX_INGREDIENTS = 100
+
+# Сколько id можно передать в пакетные запросы избранного, корзины и
+# подписок
+BATCH_MAX_IDS = 100
+
+# Асинхронные обработчики GET для рецептов, тегов и ингредиентов
+# (api.async_views); имеют смысл под ASGI-сервером
+ASYNC_READ_PATH = os.getenv('ASYNC_READ_PATH', 'False') == 'True'
+
+# Фоновые задачи (jobs): выполнение сразу после фиксации транзакции
+# вместо очереди (для тестов), срок, на который воркер занимает задачу,
+# начальная задержка повтора в секундах и число потоков воркера
+JOBS_EAGER = False
+JOBS_VISIBILITY_TIMEOUT = 5 * 60
+JOBS_RETRY_DELAY = 30
+JOBS_WORKER_THREADS = int(os.getenv('JOBS_WORKER_THREADS', 4))
+
+# Ограничения загружаемых изображений рецептов: размер файла в байтах,
+# наибольшая сторона и число пикселей
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv('MAX_IMAGE_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+MAX_IMAGE_SIDE = 8000
+MAX_IMAGE_PIXELS = 40_000_000
+
 
 DJOSER = {
     'HIDE_USERS': False,
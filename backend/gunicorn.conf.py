@@ -0,0 +1,17 @@
+import os
+
+bind = '0:8000'
+
+if os.getenv('ASYNC_READ_PATH', 'False') == 'True':
+    # Асинхронные представления чтения (api.async_views) работают
+    # под ASGI-сервером.
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def post_worker_init(worker):
+    from api.warmup import warm_up
+
+    warm_up()
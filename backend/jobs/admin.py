@@ -0,0 +1,16 @@
+from django.contrib import admin
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Представляет модель Job в интерфейсе администратора."""
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at',
+                    'locked_until')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created',)
+    actions = ('retry',)
+
+    @admin.action(description='Повторить')
+    def retry(self, request, queryset):
+        queryset.update(status=Job.QUEUED, attempts=0, locked_until=None)
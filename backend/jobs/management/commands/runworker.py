@@ -0,0 +1,67 @@
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from jobs.queue import claim, run
+
+
+def run_in_thread(job):
+    try:
+        return run(job)
+    finally:
+        # Соединение потока пула не закрывается обработчиками запроса.
+        connection.close()
+
+
+class Command(BaseCommand):
+    """Воркер очереди фоновых задач."""
+    help = ('Выполняет фоновые задачи из очереди в пуле потоков; '
+            'SIGTERM завершает воркер после текущей пачки задач')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=settings.JOBS_WORKER_THREADS,
+            help='Число потоков, выполняющих задачи'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        threads = max(options['threads'], 1)
+        done = failed = 0
+        with ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='jobs'
+        ) as executor:
+            while not self.stopping:
+                jobs = claim(threads)
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                # Один поток - задачи выполняются в основном потоке.
+                results = (
+                    map(run, jobs) if threads == 1
+                    else executor.map(run_in_thread, jobs)
+                )
+                for result in results:
+                    done += result
+                    failed += not result
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {done}, с ошибкой: {failed}'
+        ))
+
+    def stop(self, *args):
+        self.stopping = True
@@ -0,0 +1,132 @@
+"""Очередь фоновых задач в таблице Job.
+
+Функция, помеченная декоратором task, ставится в очередь методом
+enqueue: строка Job создаётся в текущей транзакции и становится видна
+воркерам вместе с её фиксацией. Команда runworker забирает задачи
+пачками и помечает их занятыми на JOBS_VISIBILITY_TIMEOUT секунд:
+если воркер упал, по истечении этого срока задачу заберёт другой.
+Задача с ошибкой повторяется с экспоненциально растущей задержкой,
+пока не исчерпает max_attempts, после чего остаётся в таблице со
+статусом failed. В режиме JOBS_EAGER (тесты) задача выполняется сразу
+после фиксации транзакции.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+from functools import update_wrapper
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class Task:
+    """Функция, которую можно выполнить в фоне."""
+
+    def __init__(self, func, max_attempts):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__name__}'
+        self.max_attempts = max_attempts
+        update_wrapper(self, func)
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def enqueue(self, *args, delay=0):
+        """Ставит вызов в очередь; аргументы должны сериализоваться
+        в JSON."""
+        return self.enqueue_many((args,), delay=delay)
+
+    def enqueue_many(self, args_list, delay=0):
+        """Ставит в очередь несколько вызовов одним запросом."""
+        # Аргументы проходят через JSON и в синхронном режиме, чтобы
+        # задача получала те же типы, что и из очереди.
+        args_list = [json.loads(json.dumps(args)) for args in args_list]
+        if settings.JOBS_EAGER:
+            for args in args_list:
+                transaction.on_commit(lambda args=args: self.run_eager(args))
+            return []
+        run_at = timezone.now() + timedelta(seconds=delay)
+        return Job.objects.bulk_create(
+            Job(name=self.name, args=args, max_attempts=self.max_attempts,
+                run_at=run_at)
+            for args in args_list
+        )
+
+    def run_eager(self, args):
+        # Транзакция уже зафиксирована: ошибка, как и в воркере,
+        # только записывается в лог.
+        try:
+            self(*args)
+        except Exception:
+            logger.exception('Задача %s завершилась с ошибкой', self.name)
+
+
+def task(func=None, *, max_attempts=3):
+    """Регистрирует функцию как фоновую задачу."""
+    def register(func):
+        task = Task(func, max_attempts)
+        TASKS[task.name] = task
+        return task
+    return register if func is None else register(func)
+
+
+def ready_jobs(now):
+    # Занятые задачи, срок которых истёк, брошены упавшим воркером.
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    )
+
+
+def claim(limit):
+    """Забирает до limit готовых к выполнению задач."""
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.JOBS_VISIBILITY_TIMEOUT)
+    with transaction.atomic():
+        jobs = ready_jobs(now).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+        ids = list(jobs.values_list('id', flat=True)[:limit])
+        # Повторная проверка условия не даёт двум воркерам забрать
+        # одну задачу там, где нет SKIP LOCKED.
+        ready_jobs(now).filter(id__in=ids).update(
+            status=Job.RUNNING, locked_until=locked_until,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_until=locked_until))
+
+
+def run(job):
+    """Выполняет задачу; при ошибке планирует повтор или помечает её
+    неудавшейся. Возвращает True при успехе."""
+    try:
+        task = TASKS.get(job.name)
+        if task is None:
+            raise LookupError(f'Неизвестная задача {job.name}')
+        task(*job.args)
+    except Exception:
+        logger.exception('Задача %s #%s завершилась с ошибкой',
+                         job.name, job.pk)
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.QUEUED, locked_until=None, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_until=None, last_error=error
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
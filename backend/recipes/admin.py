@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
+from recipes import shopping_list
 from recipes.models import (Favorite, Ingredient, IngredientsRecipe, Recipe,
                             ShoppingCart, Tag)
+from recipes.search import schedule_index
 
 EMPTY_VALUE = '-пусто-'
 
@@ -34,24 +36,26 @@ class IngredientAdmin(admin.ModelAdmin):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     """Представляет модель Recipe в интерфейсе администратора."""
-    list_display = ('id', 'name', 'author', 'tags_in_list')
+    list_display = ('id', 'name', 'author', 'tags_in_list', 'favorites_count')
     fields = (
         ('name', 'cooking_time',),
         'author',
         'tags',
         'text',
         'image',
-        'favorited_number',
+        'favorites_count',
     )
-    readonly_fields = ('favorited_number',)
+    readonly_fields = ('favorites_count',)
     search_fields = ('name', 'author__username', 'tags__name')
     list_filter = ('name', 'author', 'tags')
     empty_value_display = EMPTY_VALUE
     inlines = (IngredientInline,)
 
-    @admin.display(description='Количество добавлений в избранное')
-    def favorited_number(self, obj):
-        return obj.favorites.count()
+    def save_related(self, request, form, formsets, change):
+        old_amounts = shopping_list.recipe_amounts(form.instance)
+        super().save_related(request, form, formsets, change)
+        shopping_list.update_recipe(form.instance, old_amounts)
+        schedule_index([form.instance.id])
 
     @admin.display(description='Тэги')
     def tags_in_list(self, obj):
@@ -76,5 +80,19 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_filter = ('user',)
     empty_value_display = EMPTY_VALUE
 
+    def save_model(self, request, obj, form, change):
+        users = {obj.user_id, form.initial.get('user')} - {None}
+        super().save_model(request, obj, form, change)
+        shopping_list.rebuild(users)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        shopping_list.rebuild([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        users = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        shopping_list.rebuild(users)
+
 
 admin.site.unregister(Group)
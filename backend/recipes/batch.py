@@ -0,0 +1,162 @@
+"""Пакетное изменение избранного, корзины и подписок.
+
+Существование объектов и текущие связи пользователя проверяются одним
+запросом, новые связи создаются одним INSERT ... ON CONFLICT DO NOTHING,
+удаляемые - одним DELETE; оба возвращают (RETURNING) id объектов, связи
+с которыми действительно изменились, так что параллельные запросы не
+учитывают одну связь дважды. Запросы пишутся на SQL, чтобы не
+отправлять сигналы для каждой строки: то, что для одной связи делают
+recipes.signals (задачи для счётчиков, лент и рейтингов, кэш связей и
+списки покупок), выполняется здесь сразу для всех изменённых связей.
+RETURNING поддерживают PostgreSQL и SQLite 3.35+.
+
+Функции возвращают результат для каждого id: {id: результат}.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from recipes import relations, shopping_list, tasks
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+CREATED = 'created'
+DELETED = 'deleted'
+# Связь уже есть (при добавлении) или её нет (при удалении).
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+# Подписка на самого себя.
+SELF = 'self'
+
+
+def current_links(user, ids, model, field, targets):
+    """{id: есть ли связь} для существующих объектов из ids."""
+    return dict(targets.filter(id__in=ids).annotate(linked=Exists(
+        model.objects.filter(user=user, **{field: OuterRef('pk')})
+    )).values_list('id', 'linked'))
+
+
+def execute_returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def columns(model, field):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field(field).column),
+    )
+
+
+def outcomes(ids, linked, changed, result):
+    return {
+        pk: result if pk in changed else UNCHANGED if pk in linked
+        else NOT_FOUND
+        for pk in ids
+    }
+
+
+def link(user, ids, model, field, targets):
+    """Создаёт недостающие связи; возвращает id новых и результаты."""
+    linked = current_links(user, ids, model, field, targets)
+    new = [pk for pk in ids if linked.get(pk) is False]
+    if new:
+        table, user_column, column = columns(model, field)
+        new = execute_returning(
+            f'INSERT INTO {table} ({user_column}, {column}) VALUES '
+            f'{", ".join(["(%s, %s)"] * len(new))} '
+            f'ON CONFLICT DO NOTHING RETURNING {column}',
+            [value for pk in new for value in (user.id, pk)]
+        )
+    return sorted(new), outcomes(ids, linked, new, CREATED)
+
+
+def unlink(user, ids, model, field, targets):
+    """Удаляет существующие связи; возвращает id удалённых и
+    результаты."""
+    linked = current_links(user, ids, model, field, targets)
+    removed = [pk for pk in ids if linked.get(pk)]
+    if removed:
+        table, user_column, column = columns(model, field)
+        removed = execute_returning(
+            f'DELETE FROM {table} WHERE {user_column} = %s AND {column} IN '
+            f'({", ".join(["%s"] * len(removed))}) RETURNING {column}',
+            [user.id, *removed]
+        )
+    return sorted(removed), outcomes(ids, linked, removed, DELETED)
+
+
+@transaction.atomic
+def add_favorites(user, recipe_ids):
+    new, results = link(user, recipe_ids, Favorite, 'recipe', Recipe.objects)
+    if new:
+        tasks.apply_favorite_changes.enqueue(new, 1)
+        relations.invalidate(user.id, 'favorites')
+    return results
+
+
+@transaction.atomic
+def remove_favorites(user, recipe_ids):
+    removed, results = unlink(
+        user, recipe_ids, Favorite, 'recipe', Recipe.objects
+    )
+    if removed:
+        tasks.apply_favorite_changes.enqueue(removed, -1)
+        relations.invalidate(user.id, 'favorites')
+    return results
+
+
+@transaction.atomic
+def add_to_cart(user, recipe_ids):
+    new, results = link(
+        user, recipe_ids, ShoppingCart, 'recipe', Recipe.objects
+    )
+    if new:
+        shopping_list.apply_changes(
+            [user.id], shopping_list.total_amounts(new)
+        )
+        tasks.apply_cart_changes.enqueue(new, 1)
+        relations.invalidate(user.id, 'cart')
+    return results
+
+
+@transaction.atomic
+def remove_from_cart(user, recipe_ids):
+    removed, results = unlink(
+        user, recipe_ids, ShoppingCart, 'recipe', Recipe.objects
+    )
+    if removed:
+        shopping_list.apply_changes([user.id], {
+            pk: -amount for pk, amount in
+            shopping_list.total_amounts(removed).items()
+        })
+        tasks.apply_cart_changes.enqueue(removed, -1)
+        relations.invalidate(user.id, 'cart')
+    return results
+
+
+@transaction.atomic
+def subscribe(user, author_ids):
+    new, results = link(
+        user, author_ids, Subscription, 'author',
+        User.objects.exclude(pk=user.pk)
+    )
+    if new:
+        tasks.apply_subscription_changes.enqueue(user.id, new, 1)
+        relations.invalidate(user.id, 'following')
+    if user.id in results:
+        results[user.id] = SELF
+    return results
+
+
+@transaction.atomic
+def unsubscribe(user, author_ids):
+    removed, results = unlink(
+        user, author_ids, Subscription, 'author', User.objects
+    )
+    if removed:
+        tasks.apply_subscription_changes.enqueue(user.id, removed, -1)
+        relations.invalidate(user.id, 'following')
+    return results
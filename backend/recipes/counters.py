@@ -0,0 +1,51 @@
+"""Счётчики, хранимые в строках рецептов и пользователей.
+
+При добавлении и удалении избранного, подписок и рецептов счётчики
+меняются сигналами recipes.signals через F(), так что при чтении
+связанные строки не пересчитываются. reconcile исправляет расхождения,
+например после массовой загрузки данных.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe
+from users.models import Subscription, User
+
+# (модель, счётчик, связанная модель, поле связи)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscription, 'author'),
+)
+
+
+def change(model, pk, field, delta):
+    """Атомарно меняет счётчик строки на delta, не уходя ниже нуля."""
+    change_many(model, [pk], field, delta)
+
+
+def change_many(model, pks, field, delta):
+    """change для нескольких строк одним запросом."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def related_count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile():
+    """Пересчитывает счётчики; возвращает число исправленных строк."""
+    fixed = {}
+    for model, field, related_model, related_field in COUNTERS:
+        count = related_count(related_model, related_field)
+        fixed[f'{model.__name__}.{field}'] = model.objects.exclude(
+            **{field: count}
+        ).update(**{field: count})
+    return fixed
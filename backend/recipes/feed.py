@@ -0,0 +1,123 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Лента хранится готовой в FeedEntry (fan-out on write): публикация
+рецепта добавляет запись каждому подписчику автора, подписка добавляет
+последние рецепты автора, отписка их убирает; всё это делают фоновые
+задачи recipes.tasks после фиксации изменения. В ленте пользователя
+остаются только FEED_MAX_ENTRIES последних записей; лишние удаляются,
+когда их набирается больше FEED_TRIM_SLACK, чтобы не проверять длину
+ленты при каждой вставке.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription
+
+BATCH_SIZE = 1000
+
+
+def entries(user_ids, recipes):
+    return [
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+                  created=created)
+        for user_id in user_ids
+        for recipe_id, author_id, created in recipes
+    ]
+
+
+def trim(user_ids, slack=None):
+    """Удаляет из лент пользователей записи сверх FEED_MAX_ENTRIES, если
+    их больше slack (по умолчанию FEED_TRIM_SLACK)."""
+    if slack is None:
+        slack = settings.FEED_TRIM_SLACK
+    overfull = FeedEntry.objects.filter(user_id__in=user_ids).values(
+        'user_id'
+    ).annotate(total=Count('id')).filter(
+        total__gt=settings.FEED_MAX_ENTRIES + slack
+    ).values_list('user_id', flat=True)
+    for user_id in overfull:
+        feed = FeedEntry.objects.filter(user_id=user_id)
+        last = feed.order_by('-created', '-recipe_id').values_list(
+            'created', 'recipe_id'
+        )[settings.FEED_MAX_ENTRIES - 1]
+        feed.filter(created__lte=last[0]).exclude(
+            created=last[0], recipe_id__gte=last[1]
+        ).delete()
+
+
+@transaction.atomic
+def fan_out(recipe_id):
+    """Добавляет рецепт в ленты подписчиков его автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values_list(
+        'id', 'author_id', 'created'
+    ).first()
+    if recipe is None:
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe[1]
+    ).values_list('user_id', flat=True).iterator()
+    while batch := list(islice(followers, BATCH_SIZE)):
+        FeedEntry.objects.bulk_create(
+            entries(batch, [recipe]), ignore_conflicts=True
+        )
+        trim(batch)
+
+
+def latest_recipes(author_ids):
+    # Лента длиннее FEED_MAX_ENTRIES не бывает, поэтому последних
+    # рецептов нескольких авторов достаточно FEED_MAX_ENTRIES на всех.
+    return Recipe.objects.filter(author_id__in=author_ids).order_by(
+        '-created', '-id'
+    ).values_list('id', 'author_id', 'created')[:settings.FEED_MAX_ENTRIES]
+
+
+def add_authors(user_id, author_ids):
+    """Добавляет в ленту последние рецепты авторов после подписки."""
+    FeedEntry.objects.bulk_create(
+        entries([user_id], latest_recipes(author_ids)),
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+    trim([user_id])
+
+
+def remove_authors(user_id, author_ids):
+    """Убирает из ленты рецепты авторов после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересобирает ленты по подпискам (всех пользователей, если ids не
+    заданы); возвращает число записей."""
+    subscriptions = Subscription.objects.order_by('user_id')
+    feed = FeedEntry.objects.all()
+    if user_ids is not None:
+        subscriptions = subscriptions.filter(user_id__in=user_ids)
+        feed = feed.filter(user_id__in=user_ids)
+    feed.delete()
+    recipes = {}
+    users = set()
+    for user_id, author_id in subscriptions.values_list(
+        'user_id', 'author_id'
+    ).iterator():
+        if author_id not in recipes:
+            if len(recipes) == BATCH_SIZE:
+                recipes.clear()
+            recipes[author_id] = list(latest_recipes([author_id]))
+        FeedEntry.objects.bulk_create(
+            entries([user_id], recipes[author_id]), batch_size=BATCH_SIZE
+        )
+        users.add(user_id)
+        # Текущий пользователь попадёт и в следующую пачку, если у него
+        # остались подписки.
+        if len(users) == BATCH_SIZE:
+            trim(users, slack=0)
+            users.clear()
+    trim(users, slack=0)
+    return feed.count()
@@ -0,0 +1,145 @@
+"""Уменьшенные копии изображений рецептов.
+
+Загруженный оригинал сохраняется как есть, а копии thumbnail, card и
+full в форматах WebP и JPEG создаёт фоновая задача
+recipes.tasks.make_image_variants. Recipe.image_variants хранит имя
+исходного файла и пути к копиям; пока копии не готовы или относятся
+к прежнему изображению, API отдаёт только оригинал. Имена копий
+строятся по полному пути исходного файла (с расширением), поэтому
+рецепты с одним изображением используют общие копии, а x.png и x.jpg -
+разные. Копии заменённого изображения удаляются, когда его больше не
+использует ни один рецепт.
+"""
+import hashlib
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from recipes import versions
+from recipes.models import Recipe
+
+VARIANTS_DIR = 'recipes/variants'
+# Наибольшая сторона копии в пикселях
+SIZES = {'thumbnail': 160, 'card': 480, 'full': 1200}
+# Расширение файла: (формат Pillow, параметры сохранения)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(source, size, extension):
+    digest = hashlib.blake2b(source.encode(), digest_size=6).hexdigest()
+    return (
+        f'{VARIANTS_DIR}/{PurePosixPath(source).stem}-{digest}-{size}'
+        f'.{extension}'
+    )
+
+
+def delete_variants(variants):
+    for variant in variants.values():
+        for extension in FORMATS:
+            default_storage.delete(variant[extension])
+
+
+def open_image(source):
+    with default_storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Прозрачный фон JPEG не поддерживает: заливаем белым.
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(source):
+    """Создаёт копии изображения source:
+    {размер: {'width': ширина, расширение: путь}}."""
+    image = open_image(source)
+    variants = {}
+    for size, side in SIZES.items():
+        copy = image.copy()
+        copy.thumbnail((side, side), Image.Resampling.LANCZOS)
+        variants[size] = {'width': copy.width}
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            copy.save(buffer, image_format, **options)
+            name = variant_name(source, size, extension)
+            default_storage.delete(name)
+            variants[size][extension] = default_storage.save(
+                name, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def make_variants(source, force=False):
+    """Создаёт копии изображения и записывает их всем рецептам с этим
+    изображением; возвращает число обновлённых рецептов. Готовые копии
+    другого рецепта используются повторно, если не задан force: с ним
+    файлы копий пересоздаются, например после изменения SIZES или
+    FORMATS."""
+    ready = None if force else Recipe.objects.filter(
+        image=source, image_variants__source=source
+    ).values_list('image_variants', flat=True).first()
+    variants = ready['sizes'] if ready else render_variants(source)
+    with transaction.atomic():
+        recipes = Recipe.objects.filter(image=source)
+        replaced = {
+            old['source']: old['sizes']
+            for old in recipes.values_list('image_variants', flat=True)
+            if old.get('source') not in (None, source)
+        }
+        updated = recipes.update(
+            image_variants={'source': source, 'sizes': variants}
+        )
+        if updated:
+            versions.bump(versions.RECIPES)
+        # Копии прежнего изображения, которое осталось у других
+        # рецептов, ещё нужны.
+        for old_source in Recipe.objects.filter(
+            image__in=replaced
+        ).values_list('image', flat=True):
+            replaced.pop(old_source, None)
+        for old_variants in replaced.values():
+            transaction.on_commit(
+                lambda old_variants=old_variants: delete_variants(
+                    old_variants
+                )
+            )
+    return updated
+
+
+def needs_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') != recipe.image.name
+    )
+
+
+def image_srcset(recipe, request=None):
+    """Готовые копии изображения рецепта в виде srcset по форматам:
+    {'webp': 'url 160w, url 480w, ...', 'jpeg': ...}."""
+    if needs_variants(recipe):
+        return {}
+    srcset = {extension: {} for extension in FORMATS}
+    for variant in recipe.image_variants['sizes'].values():
+        for extension, urls in srcset.items():
+            # Маленький оригинал даёт копии одной ширины.
+            if variant['width'] in urls:
+                continue
+            url = default_storage.url(variant[extension])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant['width']] = url
+    return {
+        extension: ', '.join(
+            f'{url} {width}w' for width, url in urls.items()
+        )
+        for extension, urls in srcset.items()
+    }
@@ -0,0 +1,102 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from recipes.models import Ingredient
+
+# limit по умолчанию в search: INGREDIENT_SEARCH_LIMIT.
+DEFAULT_LIMIT = object()
+
+
+def fold(value):
+    """Приведение к виду для поиска: без регистра, «ё» равна «е»."""
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированные ключи по началу названия и по началу каждого
+    слова в названии, поиск по префиксу — двоичный поиск по ключам.
+    Строится лениво при первом обращении и сбрасывается сигналами при
+    изменении ингредиентов; INGREDIENT_INDEX_TTL ограничивает время
+    жизни индекса, если ингредиенты меняются из другого процесса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._index = None
+        self._built = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+    def _build(self):
+        entries = [
+            {
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            }
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        ]
+        entries.sort(key=lambda entry: (fold(entry['name']), entry['id']))
+        names, words = [], []
+        for position, entry in enumerate(entries):
+            name = fold(entry['name'])
+            names.append(name)
+            start = name.find(' ')
+            while start != -1:
+                words.append((name[start + 1:], position))
+                start = name.find(' ', start + 1)
+        words.sort()
+        return entries, names, words
+
+    def _get(self):
+        index = self._index
+        if (index is not None and time.monotonic() - self._built
+                < settings.INGREDIENT_INDEX_TTL):
+            return index
+        generation = self._generation
+        index = self._build()
+        with self._lock:
+            if generation == self._generation:
+                self._index, self._built = index, time.monotonic()
+        return index
+
+    def search(self, prefix=None, limit=DEFAULT_LIMIT):
+        """Ингредиенты, название или слово в названии которых начинается
+        с prefix: сначала точные совпадения, затем совпадения по началу
+        названия и по началу слова. Без prefix - все ингредиенты; limit по
+        умолчанию - INGREDIENT_SEARCH_LIMIT, None - без ограничения."""
+        if limit is DEFAULT_LIMIT:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        entries, names, words = self._get()
+        if not prefix:
+            return entries
+        prefix = fold(prefix.strip())
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + '\U0010ffff', start)
+        found = list(range(start, end))
+        found.sort(key=lambda position: names[position] != prefix)
+        seen = set(found)
+        for index in range(bisect_left(words, (prefix,)), len(words)):
+            word, position = words[index]
+            if not word.startswith(prefix) or (
+                limit is not None and len(found) >= limit
+            ):
+                break
+            if position not in seen:
+                seen.add(position)
+                found.append(position)
+        return [entries[position] for position in found[:limit]]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.3 on 2026-10-18 04:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='ingredientsrecipe',
+            unique_together={('recipe', 'ingredients')},
+        ),
+    ]
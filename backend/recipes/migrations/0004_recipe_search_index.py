@@ -0,0 +1,83 @@
+from django.db import migrations
+
+# Заполнение индекса на момент миграции; дальше его обновляет
+# recipes.search.index_recipes.
+POSTGRESQL_INDEX_SQL = """
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', replace(lower(recipe.name),
+                                                 'ё', 'е')), 'A')
+        || setweight(to_tsvector('russian', replace(lower(coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientsrecipe AS amount
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = amount.ingredients_id
+            WHERE amount.recipe_id = recipe.id
+        ), '')), 'ё', 'е')), 'B')
+        || setweight(to_tsvector('russian', replace(lower(recipe.text),
+                                                    'ё', 'е')), 'C')
+"""
+
+
+def fold(value):
+    return value.casefold().replace('ё', 'е')
+
+
+def index_sqlite(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientsRecipe = apps.get_model('recipes', 'IngredientsRecipe')
+    ingredients = {}
+    for recipe_id, name in IngredientsRecipe.objects.values_list(
+        'recipe_id', 'ingredients__name'
+    ).iterator():
+        ingredients.setdefault(recipe_id, []).append(name)
+    rows = [
+        (pk, fold(name), fold(' '.join(ingredients.get(pk, ()))), fold(text))
+        for pk, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        ).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+            'VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(POSTGRESQL_INDEX_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts '
+            'USING fts5(name, ingredients, text)'
+        )
+        index_sqlite(apps, schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_alter_ingredientsrecipe_unique_together'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
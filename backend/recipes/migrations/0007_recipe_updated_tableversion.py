@@ -0,0 +1,45 @@
+# Generated by Django 4.1.3 on 2026-10-18 05:02
+
+from django.db import migrations, models
+from django.utils import timezone
+
+TABLES = ('tags', 'ingredients', 'recipes')
+
+
+def fill_versions(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TableVersion = apps.get_model('recipes', 'TableVersion')
+    Recipe.objects.update(updated=models.F('created'))
+    TableVersion.objects.bulk_create(
+        TableVersion(table=table, version=1, updated=timezone.now())
+        for table in TABLES
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=50, unique=True, verbose_name='Таблица')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated', models.DateTimeField(verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия таблицы',
+                'verbose_name_plural': 'Версии таблиц',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.3 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'created', 'id'], name='recipe_author_created_idx'),
+        ),
+        # Автоматическая таблица связи рецептов с тэгами: фильтр по тэгу
+        # и выборка id рецептов только по индексу.
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipes_recipe_tags_tag_recipe_idx',
+        ),
+    ]
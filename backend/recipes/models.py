@@ -79,6 +79,12 @@ class Recipe(models.Model):
         null=False,
         verbose_name='Изображение блюда',
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения',
+    )
     name = models.CharField(max_length=200, verbose_name='Название')
     author = models.ForeignKey(
         User,
@@ -101,9 +107,26 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество добавлений в избранное',
+    )
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('created', 'id'), name='recipe_created_id_idx'
+            ),
+            models.Index(
+                fields=('author', 'created', 'id'),
+                name='recipe_author_created_idx'
+            ),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -134,7 +157,7 @@ class IngredientsRecipe(models.Model):
     )
 
     class Meta:
-        unique_together = ('ingredients', 'amount')
+        unique_together = ('recipe', 'ingredients')
         verbose_name = 'Количество ингредиентов'
         verbose_name_plural = 'Количество ингредиентов'
 
@@ -188,3 +211,209 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил в избранное {self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    """Сводный список покупок: сумма ингредиента по рецептам в корзине.
+
+    Поддерживается функциями recipes.shopping_list при изменении
+    корзины и состава рецептов.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        unique_together = ('user', 'ingredient')
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
+
+
+class TableVersion(models.Model):
+    """Версия данных таблицы для условных GET-запросов.
+
+    Увеличивается функцией recipes.versions.bump при любом изменении,
+    влияющем на ответы API по этой таблице.
+    """
+    table = models.CharField(
+        max_length=50,
+        unique=True,
+        verbose_name='Таблица'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Версия'
+    )
+    updated = models.DateTimeField(verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Версия таблицы'
+        verbose_name_plural = 'Версии таблиц'
+
+    def __str__(self):
+        return f'{self.table}: {self.version}'
+
+
+class FeedEntry(models.Model):
+    """Лента пользователя: рецепты авторов, на которых он подписан.
+
+    Заполняется функциями recipes.feed при публикации рецепта и при
+    подписке, так что лента читается одним проходом по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    created = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'created', 'recipe'),
+                name='feed_user_created_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'), name='feed_user_author_idx'
+            ),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'{self.user}: {self.recipe}'
+
+
+class RecipeActivity(models.Model):
+    """Добавления рецепта в избранное и в корзину за час.
+
+    Счётчики часа увеличиваются функцией recipes.scores.record_many при
+    каждом изменении; по ним пересчитываются оценки RecipeScore.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Рецепт'
+    )
+    bucket = models.DateTimeField(verbose_name='Начало часа')
+    favorites = models.IntegerField(default=0, verbose_name='Избранное')
+    carts = models.IntegerField(default=0, verbose_name='Корзины')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'bucket'), name='unique_recipe_activity'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('bucket',), name='activity_bucket_idx'),
+        )
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.bucket}: {self.favorites}/{self.carts}'
+
+
+class RecipeScore(models.Model):
+    """Оценки популярности рецепта для готовых рейтингов.
+
+    trending - затухающая сумма активности за последние дни, popular -
+    за всё время. Пересчитываются функцией recipes.scores.update.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт'
+    )
+    trending = models.FloatField(default=0, verbose_name='Оценка за неделю')
+    popular = models.PositiveIntegerField(
+        default=0, verbose_name='Оценка за всё время'
+    )
+    updated = models.DateTimeField(
+        auto_now=True, verbose_name='Дата пересчёта'
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('-trending', '-recipe'), name='score_trending_idx'
+            ),
+            models.Index(
+                fields=('-popular', '-recipe'), name='score_popular_idx'
+            ),
+        )
+        verbose_name = 'Оценка рецепта'
+        verbose_name_plural = 'Оценки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.trending:.2f}/{self.popular}'
+
+
+class SimilarRecipe(models.Model):
+    """Похожие рецепты: заранее вычисленные ближайшие соседи рецепта
+    по ингредиентам и тегам (см. recipes.similar)."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'), name='unique_similar_recipe'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'), name='similar_recipe_score_idx'
+            ),
+        )
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}'
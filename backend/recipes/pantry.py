@@ -0,0 +1,121 @@
+"""Подбор рецептов по продуктам, которые есть у пользователя.
+
+Обратный индекс в памяти процесса: для каждого ингредиента - множество
+рецептов с ним, для каждого рецепта - число его ингредиентов. Множество
+хранится как битовая карта строк рецептов (np.packbits), если ингредиент
+есть больше чем в 1/32 рецептов, иначе - отсортированным массивом uint32
+номеров строк; так каждое занимает не больше min(4 * k, n / 8) байт.
+Совпадения по набору продуктов - сумма множеств в массив счётчиков,
+без запросов к базе.
+
+Индекс строится лениво. Сигналы изменения рецептов увеличивают версию
+RECIPE_INGREDIENTS и после коммита сбрасывают индекс своего процесса;
+другие процессы сверяют версию не чаще раза в
+PANTRY_INDEX_CHECK_INTERVAL секунд.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from recipes import versions
+from recipes.models import IngredientsRecipe
+
+# Ингредиент, который есть больше чем в 1/DENSE_RATIO рецептов, хранится
+# битовой картой: она меньше массива номеров.
+DENSE_RATIO = 32
+
+
+class Index:
+    """Множества рецептов по ингредиентам на момент версии version."""
+
+    def __init__(self, pairs, version):
+        self.version = version
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self.recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        size = len(self.recipe_ids)
+        self.sizes = np.bincount(rows, minlength=size)
+        ingredient_ids, cols = np.unique(pairs[:, 1], return_inverse=True)
+        order = np.argsort(cols, kind='stable')
+        rows = rows[order].astype(np.uint32)
+        bounds = np.searchsorted(
+            cols[order], np.arange(len(ingredient_ids) + 1)
+        )
+        self.postings = {}
+        for col, pk in enumerate(ingredient_ids.tolist()):
+            posting = np.sort(rows[bounds[col]:bounds[col + 1]])
+            if len(posting) * DENSE_RATIO > size:
+                mask = np.zeros(size, dtype=bool)
+                mask[posting] = True
+                posting = np.packbits(mask)
+            self.postings[pk] = posting
+
+    def match(self, ingredient_ids, max_missing):
+        """Рецепты хотя бы с одним из ингредиентов, в которых не хватает
+        не больше max_missing: [(id, совпало, всего)] - сначала с меньшим
+        числом недостающих, затем с большей долей совпавших, затем новые."""
+        size = len(self.recipe_ids)
+        matched = np.zeros(size, dtype=np.int64)
+        for pk in set(ingredient_ids):
+            posting = self.postings.get(pk)
+            if posting is None:
+                continue
+            if posting.dtype == np.uint8:
+                matched += np.unpackbits(posting, count=size)
+            else:
+                matched[posting] += 1
+        missing = self.sizes - matched
+        rows = np.flatnonzero((matched > 0) & (missing <= max_missing))
+        ids = self.recipe_ids[rows]
+        order = np.lexsort((
+            -ids, -matched[rows] / self.sizes[rows], missing[rows]
+        ))
+        rows = rows[order]
+        return list(zip(
+            self.recipe_ids[rows].tolist(), matched[rows].tolist(),
+            self.sizes[rows].tolist()
+        ))
+
+
+class PantryIndex:
+    """Индекс Index в памяти процесса с проверкой версии."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._index = None
+        self._checked = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._index = None
+
+    def _get(self):
+        index = self._index
+        if (index is not None
+                and time.monotonic() - self._checked
+                < settings.PANTRY_INDEX_CHECK_INTERVAL):
+            return index
+        generation = self._generation
+        version = versions.get_versions(
+            versions.RECIPE_INGREDIENTS
+        )[versions.RECIPE_INGREDIENTS][0]
+        if index is None or index.version != version:
+            index = Index(
+                list(IngredientsRecipe.objects.values_list(
+                    'recipe_id', 'ingredients_id'
+                )),
+                version
+            )
+        with self._lock:
+            if generation == self._generation:
+                self._index, self._checked = index, time.monotonic()
+        return index
+
+    def match(self, ingredient_ids, max_missing):
+        return self._get().match(ingredient_ids, max_missing)
+
+
+pantry_index = PantryIndex()
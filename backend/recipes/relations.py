@@ -0,0 +1,84 @@
+"""Кэш связей пользователя: избранное, корзина и подписки.
+
+Для каждого пользователя в кэше Django хранятся отсортированные массивы
+id избранных рецептов, рецептов в корзине и авторов, на которых он
+подписан, так что флаги is_favorited, is_in_shopping_cart и
+is_subscribed вычисляются без запросов к БД. Сигналы recipes.signals
+сбрасывают массив при изменении связи, RELATIONS_CACHE_TTL ограничивает
+время жизни устаревших данных.
+"""
+import hashlib
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+CACHE_PREFIX = 'relations:v1'
+
+# Вид связи: (модель, поле с id связанного объекта)
+KINDS = {
+    'favorites': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'following': (Subscription, 'author_id'),
+}
+
+
+def cache_key(user_id, kind):
+    return f'{CACHE_PREFIX}:{user_id}:{kind}'
+
+
+class Relations:
+    """Связи одного пользователя."""
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def has(self, kind, pk):
+        ids = self.ids[kind]
+        index = bisect_left(ids, pk)
+        return index < len(ids) and ids[index] == pk
+
+    def digest(self):
+        """Короткий отпечаток всех связей для ETag."""
+        hasher = hashlib.blake2b(digest_size=8)
+        for kind in KINDS:
+            ids = self.ids[kind]
+            hasher.update(len(ids).to_bytes(8, 'little'))
+            hasher.update(ids.tobytes())
+        return hasher.hexdigest()
+
+
+ANONYMOUS = Relations({kind: array('q') for kind in KINDS})
+
+
+def get_relations(user):
+    """Связи пользователя из кэша; недостающие загружаются из БД."""
+    if user.is_anonymous:
+        return ANONYMOUS
+    keys = {kind: cache_key(user.id, kind) for kind in KINDS}
+    cached = cache.get_many(keys.values())
+    ids, missing = {}, {}
+    for kind, key in keys.items():
+        if key in cached:
+            ids[kind] = cached[key]
+            continue
+        model, field = KINDS[kind]
+        ids[kind] = missing[key] = array('q', model.objects.filter(
+            user_id=user.id
+        ).order_by(field).values_list(field, flat=True))
+    if missing:
+        cache.set_many(missing, settings.RELATIONS_CACHE_TTL)
+    return Relations(ids)
+
+
+def invalidate(user_id, kind):
+    """Сбрасывает связи пользователя сразу и ещё раз после фиксации
+    транзакции: параллельный запрос мог закэшировать данные до неё."""
+    key = cache_key(user_id, kind)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,134 @@
+"""Рейтинги рецептов: популярные за неделю и за всё время.
+
+Добавление рецепта в избранное или корзину (и удаление оттуда) меняет
+счётчики текущего часа в RecipeActivity (функция record_many, её
+вызывают фоновые задачи recipes.tasks). Периодическая задача update
+пересчитывает RecipeScore только для рецептов, у которых есть
+активность в окне TRENDING_WINDOW_DAYS:
+
+- trending - сумма активности по часам, каждый час с весом, который
+  уменьшается вдвое каждые TRENDING_HALF_LIFE_HOURS;
+- popular - взвешенное число избранных и корзин за всё время.
+
+Часы старше окна удаляются, у рецептов без активности в окне trending
+обнуляется. Полный пересчёт (full=True) нужен только после загрузки
+данных в обход сигналов. Готовые рейтинги читаются по индексам
+RecipeScore.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from recipes import versions
+from recipes.models import Recipe, RecipeActivity, RecipeScore, ShoppingCart
+
+BATCH_SIZE = 1000
+
+
+def window():
+    return timedelta(days=settings.TRENDING_WINDOW_DAYS)
+
+
+def half_life():
+    return timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def bucket_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def activity_changes(favorites, carts):
+    return {
+        'favorites': F('favorites') + favorites,
+        'carts': F('carts') + carts,
+    }
+
+
+def record_many(recipe_ids, favorites=0, carts=0):
+    """Прибавляет изменения к счётчикам текущего часа рецептов: вставка
+    недостающих строк часа и одно обновление. Рецепты, которые успели
+    удалить, пропускаются."""
+    bucket = bucket_start(timezone.now())
+    recipe_ids = list(Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', flat=True))
+    RecipeActivity.objects.bulk_create(
+        (RecipeActivity(recipe_id=recipe_id, bucket=bucket)
+         for recipe_id in recipe_ids),
+        ignore_conflicts=True
+    )
+    RecipeActivity.objects.filter(
+        recipe_id__in=recipe_ids, bucket=bucket
+    ).update(**activity_changes(favorites, carts))
+
+
+def trending_scores(now):
+    scores = defaultdict(float)
+    favorite_weight = settings.POPULARITY_FAVORITE_WEIGHT
+    cart_weight = settings.POPULARITY_CART_WEIGHT
+    for recipe_id, bucket, favorites, carts in RecipeActivity.objects.filter(
+        bucket__gte=now - window()
+    ).values_list('recipe_id', 'bucket', 'favorites', 'carts').iterator():
+        age = (now - bucket) / half_life()
+        scores[recipe_id] += (
+            favorite_weight * favorites + cart_weight * carts
+        ) * 0.5 ** age
+    return scores
+
+
+def save_scores(recipe_ids, trending, now):
+    """Пересчитывает popular рецептов и сохраняет оценки."""
+    carts = dict(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('recipe_id').annotate(total=Count('id')).order_by().values_list(
+        'recipe_id', 'total'
+    ))
+    scores = [
+        RecipeScore(
+            recipe_id=recipe_id,
+            trending=max(trending.get(recipe_id, 0), 0),
+            popular=(
+                settings.POPULARITY_FAVORITE_WEIGHT * favorites
+                + settings.POPULARITY_CART_WEIGHT * carts.get(recipe_id, 0)
+            ),
+            updated=now,
+        )
+        for recipe_id, favorites in Recipe.objects.filter(
+            id__in=recipe_ids
+        ).values_list('id', 'favorites_count')
+    ]
+    # Строки есть у рецептов, созданных через ORM; у загруженных в
+    # обход сигналов они создаются здесь.
+    RecipeScore.objects.bulk_create(scores, ignore_conflicts=True)
+    RecipeScore.objects.bulk_update(
+        scores, ('trending', 'popular', 'updated')
+    )
+
+
+@transaction.atomic
+def update(full=False):
+    """Пересчитывает оценки рецептов с активностью в окне (всех
+    рецептов при full=True); возвращает число пересчитанных."""
+    now = timezone.now()
+    trending = trending_scores(now)
+    if full:
+        recipe_ids = Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ).iterator()
+    else:
+        recipe_ids = iter(sorted(trending))
+    total = 0
+    while batch := list(islice(recipe_ids, BATCH_SIZE)):
+        save_scores(batch, trending, now)
+        total += len(batch)
+    RecipeScore.objects.filter(
+        trending__gt=0, updated__lt=now
+    ).update(trending=0)
+    RecipeActivity.objects.filter(bucket__lt=now - window()).delete()
+    versions.bump(versions.SCORES)
+    return total
@@ -0,0 +1,142 @@
+"""Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+На PostgreSQL индекс хранится в колонке search_vector (tsvector с
+русской морфологией) с GIN-индексом, на SQLite — в FTS5-таблице
+recipes_recipe_fts. Обе структуры создаются миграцией и обновляются
+функцией index_recipes после изменения рецепта, полностью —
+командой rebuild_search_index.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+from recipes.ingredient_index import fold
+from recipes.models import Ingredient, IngredientsRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+# Вес совпадений в названии, ингредиентах и описании
+FTS_WEIGHTS = '10.0, 4.0, 1.0'
+
+RECIPE_TABLE = Recipe._meta.db_table
+INGREDIENTS_RECIPE_TABLE = IngredientsRecipe._meta.db_table
+INGREDIENT_TABLE = Ingredient._meta.db_table
+
+POSTGRESQL_INDEX_SQL = f"""
+    UPDATE {RECIPE_TABLE} AS recipe SET search_vector =
+        setweight(to_tsvector(%(config)s, replace(lower(recipe.name),
+                                                  'ё', 'е')), 'A')
+        || setweight(to_tsvector(%(config)s, replace(lower(coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM {INGREDIENTS_RECIPE_TABLE} AS amount
+            JOIN {INGREDIENT_TABLE} AS ingredient
+                ON ingredient.id = amount.ingredients_id
+            WHERE amount.recipe_id = recipe.id
+        ), '')), 'ё', 'е')), 'B')
+        || setweight(to_tsvector(%(config)s, replace(lower(recipe.text),
+                                                     'ё', 'е')), 'C')
+"""
+
+
+def tokenize(query):
+    return re.findall(r'\w+', fold(query))
+
+
+@transaction.atomic
+def index_recipes(recipe_ids=None):
+    """Обновляет поисковый индекс рецептов (всех, если ids не заданы)."""
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+    if connection.vendor == 'postgresql':
+        sql, params = POSTGRESQL_INDEX_SQL, {'config': SEARCH_CONFIG}
+        if recipe_ids is not None:
+            sql += ' WHERE recipe.id = ANY(%(ids)s)'
+            params['ids'] = recipe_ids
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+    elif connection.vendor == 'sqlite':
+        index_sqlite(recipe_ids)
+
+
+def index_sqlite(recipe_ids):
+    recipes = Recipe.objects.order_by()
+    amounts = IngredientsRecipe.objects.order_by()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+        amounts = amounts.filter(recipe_id__in=recipe_ids)
+    ingredients = {}
+    for recipe_id, name in amounts.values_list(
+        'recipe_id', 'ingredients__name'
+    ).iterator():
+        ingredients.setdefault(recipe_id, []).append(name)
+    rows = [
+        (pk, fold(name), fold(' '.join(ingredients.get(pk, ()))), fold(text))
+        for pk, name, text in recipes.values_list(
+            'id', 'name', 'text'
+        ).iterator()
+    ]
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        else:
+            remove_recipes(recipe_ids)
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            'VALUES (%s, %s, %s, %s)', rows
+        )
+
+
+def remove_recipes(recipe_ids):
+    """Удаляет рецепты из FTS5-таблицы; на PostgreSQL индекс хранится
+    в самой строке рецепта и удаляется вместе с ней."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in recipe_ids]
+            )
+
+
+def schedule_index(recipe_ids):
+    """Переиндексация рецептов после фиксации текущей транзакции."""
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: index_recipes(recipe_ids))
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, в порядке релевантности."""
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        queryset = queryset.filter(RawSQL(
+            f'{RECIPE_TABLE}.search_vector @@ to_tsquery(%s, %s)',
+            (SEARCH_CONFIG, tsquery), output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank({RECIPE_TABLE}.search_vector, to_tsquery(%s, %s))',
+            (SEARCH_CONFIG, tsquery)
+        ))
+    elif connection.vendor == 'sqlite':
+        # Ранг bm25 доступен только в запросе с MATCH по FTS-таблице,
+        # поэтому таблица присоединяется через extra().
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[' '.join(f'"{token}"*' for token in tokens)],
+            select={'search_rank': f'-bm25({FTS_TABLE}, {FTS_WEIGHTS})'},
+        )
+    else:
+        for token in tokens:
+            queryset = queryset.filter(
+                Q(name__icontains=token)
+                | Q(text__icontains=token)
+                | Q(ingredients__name__icontains=token)
+            )
+        return queryset.distinct()
+    return queryset.order_by('-search_rank', *Recipe._meta.ordering)
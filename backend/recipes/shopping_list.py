@@ -0,0 +1,162 @@
+"""Сводный список покупок пользователей.
+
+ShoppingListItem хранит для каждого пользователя сумму каждого
+ингредиента по рецептам в его корзине. Функции модуля меняют корзину
+и сводный список в одной транзакции, rebuild пересчитывает список
+заново, если он разошёлся с корзиной.
+"""
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import IngredientsRecipe, ShoppingCart, ShoppingListItem
+from users.models import User
+
+BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe):
+    """Количество каждого ингредиента рецепта: {ingredient_id: amount}."""
+    return dict(IngredientsRecipe.objects.filter(recipe=recipe).values_list(
+        'ingredients_id', 'amount'
+    ))
+
+
+def total_amounts(recipe_ids):
+    """Сумма количеств каждого ингредиента рецептов:
+    {ingredient_id: amount}."""
+    return dict(IngredientsRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredients_id').annotate(total=Sum('amount')).order_by(
+    ).values_list('ingredients_id', 'total'))
+
+
+def apply_changes(user_ids, changes):
+    """Прибавляет изменения {ingredient_id: delta} к спискам покупок
+    пользователей; позиции с неположительным итогом удаляются."""
+    changes = {pk: delta for pk, delta in changes.items() if delta}
+    if not changes:
+        return
+    user_ids = iter(user_ids)
+    while batch := sorted(islice(user_ids, BATCH_SIZE)):
+        apply_batch(batch, changes)
+
+
+def apply_batch(user_ids, changes):
+    # Блокировка строк пользователей упорядочивает параллельные
+    # изменения одного и того же списка покупок.
+    list(User.objects.select_for_update().filter(
+        id__in=user_ids
+    ).order_by('id').values_list('id', flat=True))
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=changes
+        )
+    }
+    new, changed, removed = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in changes.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    new.append(ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=delta,
+                    ))
+            elif item.total_amount + delta > 0:
+                item.total_amount += delta
+                changed.append(item)
+            else:
+                removed.append(item.pk)
+    ShoppingListItem.objects.bulk_create(new, batch_size=BATCH_SIZE)
+    ShoppingListItem.objects.bulk_update(
+        changed, ('total_amount',), batch_size=BATCH_SIZE
+    )
+    if removed:
+        ShoppingListItem.objects.filter(pk__in=removed).delete()
+
+
+@transaction.atomic
+def add_to_cart(user, recipe):
+    """Добавляет рецепт в корзину; False, если он уже там."""
+    _, created = ShoppingCart.objects.get_or_create(user=user, recipe=recipe)
+    if created:
+        apply_changes([user.id], recipe_amounts(recipe))
+    return created
+
+
+@transaction.atomic
+def remove_from_cart(user, recipe):
+    """Убирает рецепт из корзины; False, если его там не было."""
+    deleted, _ = ShoppingCart.objects.filter(
+        user=user, recipe=recipe
+    ).delete()
+    if deleted:
+        apply_changes([user.id], {
+            pk: -amount for pk, amount in recipe_amounts(recipe).items()
+        })
+    return bool(deleted)
+
+
+def cart_users(recipe):
+    return ShoppingCart.objects.filter(recipe=recipe).values_list(
+        'user_id', flat=True
+    ).iterator()
+
+
+@transaction.atomic
+def update_recipe(recipe, old_amounts, new_amounts=None):
+    """Переносит изменение состава рецепта в списки покупок
+    пользователей, у которых он в корзине."""
+    if new_amounts is None:
+        new_amounts = recipe_amounts(recipe)
+    apply_changes(cart_users(recipe), {
+        pk: new_amounts.get(pk, 0) - old_amounts.get(pk, 0)
+        for pk in old_amounts.keys() | new_amounts.keys()
+    })
+
+
+def removal_batches(recipe):
+    """Изменения списков покупок при удалении рецепта пачками по
+    BATCH_SIZE пользователей: (user_ids, {ingredient_id: delta}).
+    Корзины удаляются каскадом вместе с рецептом, поэтому их нужно
+    прочитать до удаления."""
+    changes = {pk: -amount for pk, amount in recipe_amounts(recipe).items()}
+    if not changes:
+        return
+    users = cart_users(recipe)
+    while batch := list(islice(users, BATCH_SIZE)):
+        yield batch, changes
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересчитывает сводные списки покупок по корзинам (всех
+    пользователей, если ids не заданы); возвращает число позиций."""
+    items = ShoppingListItem.objects.all()
+    carts = ShoppingCart.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+        carts = carts.filter(user_id__in=user_ids)
+    items.delete()
+    # related_name связи рецепта с количествами ингредиентов - recipe.
+    rows = carts.values('user', 'recipe__recipe__ingredients').annotate(
+        total=Sum('recipe__recipe__amount')
+    ).order_by().values_list(
+        'user', 'recipe__recipe__ingredients', 'total'
+    ).iterator()
+    created = 0
+    while batch := list(islice(rows, BATCH_SIZE)):
+        created += len(ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total,
+            )
+            for user_id, ingredient_id, total in batch
+            if ingredient_id is not None
+        ))
+    return created
@@ -0,0 +1,162 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes import counters, images, relations, tasks, versions
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeScore,
+                            ShoppingCart, Tag)
+from recipes.pantry import pantry_index
+from recipes.search import remove_recipes
+from recipes.shopping_list import removal_batches
+from users.models import Subscription, User
+
+
+def deleted_with(origin, model):
+    """Удаление начато с объектов model (origin - объект или QuerySet)."""
+    return getattr(origin, 'model', type(origin)) is model
+
+
+def deleted_directly(instance, origin):
+    # При удалении рецепта или пользователя каскадом активность не
+    # учитывается: рецепта может уже не быть.
+    return deleted_with(origin, type(instance))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    versions.bump(versions.INGREDIENTS, versions.RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    versions.bump(versions.TAGS, versions.RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipes_version(**kwargs):
+    versions.bump(versions.RECIPES)
+
+
+# Избранное и подписки версию рецептов не меняют: флаги пользователя
+# входят в ETag отпечатком его связей, а счётчиков в ответах рецептов нет.
+# Из данных пользователя в них есть только имя и почта автора.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_on_author_change(instance, update_fields=None,
+                                          **kwargs):
+    if instance.recipes_count and (
+        update_fields is None or AUTHOR_FIELDS & set(update_fields)
+    ):
+        versions.bump(versions.RECIPES)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_image_variants(instance, **kwargs):
+    if images.needs_variants(instance):
+        tasks.make_image_variants.enqueue(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(instance, created, **kwargs):
+    if created:
+        tasks.fan_out_recipe.enqueue(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def schedule_similar_recipes(instance, **kwargs):
+    # Состав рецепта сохраняется после строки рецепта, но в той же
+    # транзакции: задача увидит его целиком.
+    tasks.refresh_similar_recipes.enqueue(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_pantry_index(update_fields=None, **kwargs):
+    # Состав рецепта сохраняется вместе с рецептом целиком; сохранение
+    # отдельных полей (update_fields) его не меняет.
+    if update_fields is None:
+        versions.bump(versions.RECIPE_INGREDIENTS)
+        transaction.on_commit(pantry_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_search_index(instance, **kwargs):
+    remove_recipes([instance.id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(instance, **kwargs):
+    tasks.apply_shopping_list_changes.enqueue_many(removal_batches(instance))
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(instance, created, **kwargs):
+    if created:
+        counters.change(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(instance, **kwargs):
+    counters.change(User, instance.author_id, 'recipes_count', -1)
+
+
+# Один обработчик на изменение связи: в запросе сбрасывается только кэш
+# связей пользователя (после фиксации), остальные последствия выполняет
+# фоновая задача, строка которой создаётся в той же транзакции.
+@receiver(post_save, sender=Favorite)
+def favorite_added(instance, created, **kwargs):
+    if created:
+        relations.invalidate(instance.user_id, 'favorites')
+        tasks.apply_favorite_changes.enqueue([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed(instance, origin=None, **kwargs):
+    relations.invalidate(instance.user_id, 'favorites')
+    # Вместе с рецептом удаляется и его счётчик.
+    if not deleted_with(origin, Recipe):
+        tasks.apply_favorite_changes.enqueue(
+            [instance.recipe_id], -1, deleted_directly(instance, origin)
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_added(instance, created, **kwargs):
+    if created:
+        relations.invalidate(instance.user_id, 'cart')
+        tasks.apply_cart_changes.enqueue([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_removed(instance, origin=None, **kwargs):
+    relations.invalidate(instance.user_id, 'cart')
+    if deleted_directly(instance, origin):
+        tasks.apply_cart_changes.enqueue([instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_added(instance, created, **kwargs):
+    if created:
+        relations.invalidate(instance.user_id, 'following')
+        tasks.apply_subscription_changes.enqueue(
+            instance.user_id, [instance.author_id], 1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_removed(instance, **kwargs):
+    relations.invalidate(instance.user_id, 'following')
+    tasks.apply_subscription_changes.enqueue(
+        instance.user_id, [instance.author_id], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(recipe=instance)
@@ -0,0 +1,259 @@
+"""Похожие рецепты по ингредиентам и тегам.
+
+Рецепты - строки разреженной матрицы рецепт × ингредиент в массивах
+NumPy (CSR), ингредиент взвешен по редкости (idf). Сходство двух
+рецептов - косинус их векторов ингредиентов с весом 1 - w плюс
+коэффициент Жаккара наборов тегов с весом w
+(SIMILAR_RECIPES_TAG_WEIGHT). Кандидаты в соседи берутся из списков
+рецептов по ингредиентам рецепта; ингредиенты, которые есть больше чем
+в SIMILAR_RECIPES_MAX_POSTING рецептах (соль, вода), кандидатов не
+добавляют, но входят в сходство.
+
+rebuild пачкой вычисляет k (SIMILAR_RECIPES_TOP_K) соседей всех
+рецептов в SimilarRecipe, так что запрос похожих рецептов - чтение
+нескольких строк по индексу. refresh после изменения рецепта
+пересчитывает его соседей и добавляет рецепт в списки соседей, где он
+теперь входит в первые k. Рецепт, который стал меньше похож на другие,
+из их списков только удаляется, так что до следующей пересборки в них
+может быть меньше k рецептов. Частоты ингредиентов для refresh берутся
+из кэша, который обновляет rebuild.
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from recipes.models import IngredientsRecipe, Recipe, SimilarRecipe, Tag
+
+BATCH_SIZE = 1000
+FREQUENCIES_CACHE_KEY = 'similar:frequencies'
+# Во сколько раз больше k самых похожих рецептов проверяется при
+# обновлении их списков.
+REFRESH_CANDIDATES_FACTOR = 10
+# Теги рецепта - битовая маска из слов uint64, по биту на тег.
+TAG_BITS = 64
+
+
+def popcount(values):
+    """Число единичных битов в каждой строке масок (рецепты × слова)."""
+    return np.unpackbits(values.view(np.uint8), axis=1).sum(axis=1)
+
+
+class Matrix:
+    """Ингредиенты и теги рецептов в массивах NumPy."""
+
+    def __init__(self, pairs, tag_pairs, frequencies, total):
+        pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        self.recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+        ingredient_ids, cols = np.unique(pairs[:, 1], return_inverse=True)
+        frequency = np.array(
+            [frequencies.get(pk, 1) for pk in ingredient_ids.tolist()],
+            dtype=np.float64
+        )
+        self.idf = np.log1p(total / frequency)
+        self.common = frequency > settings.SIMILAR_RECIPES_MAX_POSTING
+        size = len(self.recipe_ids)
+        # Строки матрицы: ингредиенты рецепта cols[indptr[r]:indptr[r+1]].
+        order = np.argsort(rows, kind='stable')
+        self.cols = cols[order]
+        self.indptr = np.searchsorted(rows[order], np.arange(size + 1))
+        # Столбцы: рецепты с ингредиентом.
+        order = np.argsort(cols, kind='stable')
+        self.posting_rows = rows[order]
+        self.posting_ptr = np.searchsorted(
+            cols[order], np.arange(len(ingredient_ids) + 1)
+        )
+        self.norms = np.sqrt(np.bincount(
+            rows, weights=self.idf[cols] ** 2, minlength=size
+        ))
+        tag_pairs = np.array(tag_pairs, dtype=np.int64).reshape(-1, 2)
+        words = 1 + (
+            int(tag_pairs[:, 1].max()) // TAG_BITS if len(tag_pairs) else 0
+        )
+        self.tags = np.zeros((size, words), dtype=np.uint64)
+        tag_rows = np.searchsorted(self.recipe_ids, tag_pairs[:, 0])
+        known = tag_rows < size
+        known[known] = self.recipe_ids[tag_rows[known]] == tag_pairs[known, 0]
+        bits = tag_pairs[known, 1]
+        np.bitwise_or.at(
+            self.tags, (tag_rows[known], bits // TAG_BITS),
+            np.left_shift(np.uint64(1), (bits % TAG_BITS).astype(np.uint64))
+        )
+
+    @classmethod
+    def load(cls, recipes=None, frequencies=None):
+        """Матрица рецептов, подходящих под условие recipes (всех, если
+        оно не задано)."""
+        if frequencies is None:
+            frequencies = document_frequencies()
+        pairs = IngredientsRecipe.objects.all()
+        tag_pairs = Recipe.tags.through.objects.all()
+        if recipes is not None:
+            pairs = pairs.filter(recipes)
+            tag_pairs = tag_pairs.filter(recipes)
+        bits = tag_bits()
+        return cls(
+            list(pairs.values_list('recipe_id', 'ingredients_id')),
+            [(recipe_id, bits[tag_id]) for recipe_id, tag_id in
+             tag_pairs.values_list('recipe_id', 'tag_id')],
+            frequencies, Recipe.objects.count()
+        )
+
+    def row(self, recipe_id):
+        row = int(np.searchsorted(self.recipe_ids, recipe_id))
+        if row < len(self.recipe_ids) and self.recipe_ids[row] == recipe_id:
+            return row
+        return None
+
+    def neighbours(self, row, limit=None):
+        """До limit (по умолчанию SIMILAR_RECIPES_TOP_K) самых похожих
+        рецептов: (id, сходство) по убыванию сходства."""
+        if limit is None:
+            limit = settings.SIMILAR_RECIPES_TOP_K
+        own = self.cols[self.indptr[row]:self.indptr[row + 1]]
+        postings = [
+            self.posting_rows[self.posting_ptr[col]:self.posting_ptr[col + 1]]
+            for col in own[~self.common[own]]
+        ]
+        if not postings:
+            return []
+        candidates = np.unique(np.concatenate(postings))
+        candidates = candidates[candidates != row]
+        if not len(candidates):
+            return []
+        # Ингредиенты кандидатов подряд: owner - номер кандидата.
+        starts = self.indptr[candidates]
+        lengths = self.indptr[candidates + 1] - starts
+        owner = np.repeat(np.arange(len(candidates)), lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        cols = self.cols[np.repeat(starts, lengths) + offsets]
+        shared = np.isin(cols, own)
+        dot = np.bincount(
+            owner, weights=shared * self.idf[cols] ** 2,
+            minlength=len(candidates)
+        )
+        cosine = dot / (self.norms[row] * self.norms[candidates])
+        tags = self.tags[candidates]
+        union = popcount(tags | self.tags[row])
+        jaccard = np.divide(
+            popcount(tags & self.tags[row]), union,
+            out=np.zeros(len(candidates)), where=union > 0
+        )
+        tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+        scores = (1 - tag_weight) * cosine + tag_weight * jaccard
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        ids = self.recipe_ids[candidates]
+        order = np.lexsort((ids, -scores))
+        return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+
+def document_frequencies():
+    """Число рецептов с каждым ингредиентом."""
+    return dict(IngredientsRecipe.objects.values('ingredients').annotate(
+        total=Count('id')
+    ).order_by().values_list('ingredients', 'total'))
+
+
+def cached_frequencies():
+    """document_frequencies из кэша. Для весов idf при обновлении одного
+    рецепта достаточно приблизительных частот: точные записывает в кэш
+    rebuild, а устаревают они не дольше
+    SIMILAR_RECIPES_FREQUENCIES_TTL."""
+    frequencies = cache.get(FREQUENCIES_CACHE_KEY)
+    if frequencies is None:
+        frequencies = document_frequencies()
+        cache.set(
+            FREQUENCIES_CACHE_KEY, frequencies,
+            settings.SIMILAR_RECIPES_FREQUENCIES_TTL
+        )
+    return frequencies
+
+
+def tag_bits():
+    """Номер бита каждого тега в маске тегов."""
+    return {
+        pk: index for index, pk in enumerate(
+            Tag.objects.order_by('id').values_list('id', flat=True)
+        )
+    }
+
+
+def rows(recipe_id, neighbours):
+    return [
+        SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id, score=score)
+        for similar_id, score in neighbours
+    ]
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает соседей всех рецептов; возвращает число строк."""
+    frequencies = document_frequencies()
+    cache.set(
+        FREQUENCIES_CACHE_KEY, frequencies,
+        settings.SIMILAR_RECIPES_FREQUENCIES_TTL
+    )
+    matrix = Matrix.load(frequencies=frequencies)
+    SimilarRecipe.objects.all().delete()
+    total = 0
+    batch = []
+    for row, recipe_id in enumerate(matrix.recipe_ids.tolist()):
+        batch += rows(recipe_id, matrix.neighbours(row))
+        if len(batch) >= BATCH_SIZE:
+            total += len(SimilarRecipe.objects.bulk_create(batch))
+            batch = []
+    return total + len(SimilarRecipe.objects.bulk_create(batch))
+
+
+@transaction.atomic
+def refresh(recipe_id):
+    """Обновляет соседей рецепта и его место в списках соседей."""
+    frequencies = cached_frequencies()
+    top_k = settings.SIMILAR_RECIPES_TOP_K
+    rare = [
+        pk for pk in IngredientsRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredients_id', flat=True)
+        if frequencies.get(pk, 0) <= settings.SIMILAR_RECIPES_MAX_POSTING
+    ]
+    candidates = IngredientsRecipe.objects.filter(
+        ingredients_id__in=rare
+    ).values('recipe_id')
+    matrix = Matrix.load(
+        Q(recipe_id=recipe_id) | Q(recipe_id__in=candidates), frequencies
+    )
+    SimilarRecipe.objects.filter(
+        Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)
+    ).delete()
+    row = matrix.row(recipe_id)
+    if row is None:
+        return
+    neighbours = matrix.neighbours(row, REFRESH_CANDIDATES_FACTOR * top_k)
+    lists = defaultdict(list)
+    for pk, owner, score in SimilarRecipe.objects.filter(
+        recipe_id__in=[similar_id for similar_id, _ in neighbours]
+    ).values_list('id', 'recipe_id', 'score'):
+        lists[owner].append((score, pk))
+    new, removed = rows(recipe_id, neighbours[:top_k]), []
+    for similar_id, score in neighbours:
+        entries = lists[similar_id]
+        if len(entries) < top_k:
+            new.append(SimilarRecipe(
+                recipe_id=similar_id, similar_id=recipe_id, score=score
+            ))
+            continue
+        lowest = min(entries)
+        if score > lowest[0]:
+            new.append(SimilarRecipe(
+                recipe_id=similar_id, similar_id=recipe_id, score=score
+            ))
+            removed.append(lowest[1])
+    SimilarRecipe.objects.filter(pk__in=removed).delete()
+    SimilarRecipe.objects.bulk_create(new, batch_size=BATCH_SIZE)
@@ -0,0 +1,77 @@
+"""Фоновые задачи приложения recipes (см. jobs.queue)."""
+from django.db import transaction
+
+from jobs.queue import task
+from recipes import counters, feed, images, scores, shopping_list, similar
+from recipes.models import Recipe
+from users.models import User
+
+
+@task
+def make_image_variants(source):
+    images.make_variants(source)
+
+
+@task
+@transaction.atomic
+def apply_shopping_list_changes(user_ids, changes):
+    # Ключи словаря после JSON - строки.
+    shopping_list.apply_changes(user_ids, {
+        int(pk): delta for pk, delta in changes.items()
+    })
+
+
+@task
+@transaction.atomic
+def apply_favorite_changes(recipe_ids, delta, activity=True):
+    """Последствия добавления рецептов в избранное (delta = 1) или
+    удаления из него (delta = -1). Удаление вместе с пользователем
+    (activity=False) меняет только счётчики."""
+    counters.change_many(Recipe, recipe_ids, 'favorites_count', delta)
+    if activity:
+        scores.record_many(recipe_ids, favorites=delta)
+
+
+@task
+@transaction.atomic
+def apply_cart_changes(recipe_ids, delta):
+    """Последствия добавления рецептов в корзину (delta = 1) или
+    удаления из неё (delta = -1)."""
+    scores.record_many(recipe_ids, carts=delta)
+
+
+@task
+@transaction.atomic
+def apply_subscription_changes(user_id, author_ids, delta):
+    """Последствия подписки пользователя на авторов (delta = 1) или
+    отписки (delta = -1)."""
+    counters.change_many(User, author_ids, 'followers_count', delta)
+    if delta > 0:
+        feed.add_authors(user_id, author_ids)
+    else:
+        feed.remove_authors(user_id, author_ids)
+
+
+@task(max_attempts=1)
+def reconcile_counters():
+    counters.reconcile()
+
+
+@task
+def fan_out_recipe(recipe_id):
+    feed.fan_out(recipe_id)
+
+
+@task(max_attempts=1)
+def update_recipe_scores():
+    scores.update()
+
+
+@task
+def refresh_similar_recipes(recipe_id):
+    similar.refresh(recipe_id)
+
+
+@task(max_attempts=1)
+def rebuild_similar_recipes():
+    similar.rebuild()
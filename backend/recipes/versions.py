@@ -0,0 +1,52 @@
+"""Версии таблиц для ETag и Last-Modified.
+
+Версия таблицы увеличивается в той же транзакции, что и изменение
+данных, поэтому вместе с ним становится видна другим процессам.
+Проверка If-None-Match и If-Modified-Since стоит одного запроса
+к TableVersion вместо выборки и сериализации данных.
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.models import TableVersion
+
+TAGS = 'tags'
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+SCORES = 'scores'
+RECIPE_INGREDIENTS = 'recipe_ingredients'
+
+
+def bump(*tables):
+    """Увеличивает версии таблиц."""
+    now = timezone.now()
+    updated = TableVersion.objects.filter(table__in=tables).update(
+        version=F('version') + 1, updated=now
+    )
+    if updated < len(tables):
+        TableVersion.objects.bulk_create(
+            (TableVersion(table=table, version=1, updated=now)
+             for table in tables),
+            ignore_conflicts=True
+        )
+
+
+def versions_query(tables):
+    return TableVersion.objects.filter(table__in=tables).values_list(
+        'table', 'version', 'updated'
+    )
+
+
+def fill_versions(tables, rows):
+    versions = {table: (version, updated) for table, version, updated in rows}
+    return {table: versions.get(table, (0, None)) for table in tables}
+
+
+def get_versions(*tables):
+    """Версии таблиц: {table: (version, updated)}."""
+    return fill_versions(tables, versions_query(tables))
+
+
+async def aget_versions(*tables):
+    """Асинхронный вариант get_versions."""
+    return fill_versions(tables, [row async for row in versions_query(tables)])
@@ -0,0 +1,154 @@
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.counters import reconcile as reconcile_counters
+from recipes.feed import rebuild as rebuild_feeds
+from recipes.models import (Favorite, Ingredient, IngredientsRecipe, Recipe,
+                            ShoppingCart, Tag)
+from recipes.relations import get_relations
+from recipes.scores import update as update_scores
+from recipes.search import index_recipes
+from recipes.similar import rebuild as rebuild_similar
+from recipes.shopping_list import rebuild as rebuild_shopping_lists
+from users.models import Subscription, User
+
+AUTHORS_NUMBER = 5
+RECIPES_PER_AUTHOR = 8
+INGREDIENTS_NUMBER = 60
+INGREDIENTS_PER_RECIPE = 10
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+IMAGE = 'recipes/images/placeholder.png'
+
+BUDGET_RESULTS = []
+DATASET = {}
+
+
+def seed_dataset():
+    """Набор данных, на котором проверяются бюджеты запросов."""
+    buffer = BytesIO()
+    Image.new('RGB', (4, 3), 'orange').save(buffer, 'PNG')
+    default_storage.save(IMAGE, ContentFile(buffer.getvalue()))
+    tags = [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in TAGS
+    ]
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS_NUMBER)
+    )
+    user = User.objects.create_user(
+        username='reader', email='reader@foodgram.ru', password='password',
+        first_name='Читатель', last_name='Читателев',
+    )
+    authors = [
+        User.objects.create_user(
+            username=f'author{number}', email=f'author{number}@foodgram.ru',
+            password='password', first_name='Автор', last_name=str(number),
+        )
+        for number in range(AUTHORS_NUMBER)
+    ]
+    recipes = []
+    for author in authors:
+        for number in range(RECIPES_PER_AUTHOR):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {author.username}-{number}',
+                text='Описание рецепта', cooking_time=10 + number,
+                image=IMAGE,
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            recipes.append(recipe)
+    IngredientsRecipe.objects.bulk_create(
+        IngredientsRecipe(
+            recipe=recipe,
+            ingredients=ingredients[(index + shift) % INGREDIENTS_NUMBER],
+            amount=shift + 1,
+        )
+        for index, recipe in enumerate(recipes)
+        for shift in range(INGREDIENTS_PER_RECIPE)
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::3]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::4]
+    )
+    Subscription.objects.bulk_create(
+        Subscription(user=user, author=author) for author in authors[:3]
+    )
+    index_recipes()
+    rebuild_shopping_lists()
+    rebuild_feeds()
+    reconcile_counters()
+    update_scores(full=True)
+    rebuild_similar()
+    return {
+        'user': user,
+        'token': Token.objects.create(user=user).key,
+        'author': authors[0],
+        'other_author': authors[-1],
+        'recipe': recipes[0],
+        'favorited_recipe': recipes[0],
+        'new_recipe': recipes[1],
+        'own_recipe': Recipe.objects.create(
+            author=user, name='Свой рецепт', text='Описание',
+            cooking_time=5, image=IMAGE,
+        ),
+        'tags': tags,
+        'ingredients': ingredients,
+    }
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        DATASET.update(seed_dataset())
+
+
+@pytest.fixture
+def dataset(db):
+    # Откат транзакции теста не затрагивает кэш.
+    cache.clear()
+    yield DATASET
+    cache.clear()
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(dataset):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {dataset["token"]}')
+    # Бюджеты считаются для прогретого кэша связей пользователя.
+    get_relations(dataset['user'])
+    return client
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not BUDGET_RESULTS:
+        return
+    terminalreporter.section('query budget')
+    terminalreporter.write_line(
+        f'{"endpoint":<44}{"caller":<7}{"status":>7}'
+        f'{"queries":>9}{"budget":>8}{"ms":>9}{"budget":>8}'
+    )
+    for result in sorted(BUDGET_RESULTS):
+        name, caller, status, queries, max_queries, ms, max_ms = result
+        marker = '' if queries <= max_queries and ms <= max_ms else '  !'
+        terminalreporter.write_line(
+            f'{name:<44}{caller:<7}{status:>7}'
+            f'{queries:>9}{max_queries:>8}{ms:>9.1f}{max_ms:>8}{marker}'
+        )
@@ -0,0 +1,73 @@
+import pytest
+from django.core.cache import cache
+from django.urls import resolve
+
+URLS = (
+    '/api/tags/',
+    '/api/tags/{tag}/',
+    '/api/tags/0/',
+    '/api/tags/?search=Обед',
+    '/api/ingredients/',
+    '/api/ingredients/?name=ингредиент 1',
+    '/api/recipes/',
+    '/api/recipes/?page=2&limit=5',
+    '/api/recipes/?page=100',
+    '/api/recipes/?tags=breakfast&tags=dinner',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?author={author}',
+    '/api/recipes/{recipe}/',
+    '/api/recipes/0/',
+)
+
+
+def get(client, url, urls, **headers):
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr('django.conf.settings.ROOT_URLCONF', urls)
+        cache.clear()
+        return client.get(url, **headers)
+
+
+@pytest.mark.parametrize('caller', ('anonymous_client', 'user_client'))
+@pytest.mark.parametrize('url', URLS)
+def test_same_response_as_sync_views(dataset, request, caller, url):
+    client = request.getfixturevalue(caller)
+    url = url.format(
+        tag=dataset['tags'][0].id, author=dataset['author'].id,
+        recipe=dataset['recipe'].id,
+    )
+    expected = get(client, url, 'foodgram.urls')
+    response = get(client, url, 'tests.async_urls')
+    assert response.status_code == expected.status_code
+    assert response.content == expected.content
+    assert response.get('ETag') == expected.get('ETag')
+    assert response['Vary'] == expected['Vary']
+
+
+@pytest.mark.urls('tests.async_urls')
+def test_async_views_handle_reads(dataset, user_client, anonymous_client):
+    assert resolve('/api/recipes/').namespace == 'async'
+    response = user_client.get('/api/recipes/')
+    assert response.status_code == 200
+    response = user_client.get(
+        '/api/recipes/', HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == 304
+
+    response = anonymous_client.get(
+        '/api/recipes/', HTTP_AUTHORIZATION='Token wrong'
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.urls('tests.async_urls')
+def test_writes_fall_back_to_sync_views(dataset, user_client):
+    recipe = dataset['own_recipe']
+    response = user_client.patch(
+        f'/api/recipes/{recipe.id}/', data={'name': 'Новое имя'},
+        format='json',
+    )
+    assert response.status_code == 200, response.content
+    assert response.data['name'] == 'Новое имя'
+    assert user_client.get(
+        f'/api/recipes/{recipe.id}/'
+    ).json()['name'] == 'Новое имя'
@@ -0,0 +1,143 @@
+from recipes import batch
+from recipes.counters import reconcile
+from recipes.models import Favorite, Recipe, RecipeActivity, ShoppingCart
+from recipes.relations import get_relations
+from recipes.shopping_list import rebuild
+from tests.test_feed import expected_ids, feed_ids
+from tests.test_shopping_list import shopping_list
+
+MISSING_ID = 10 ** 9
+
+
+def statuses(response):
+    return {item['id']: item['status'] for item in response.data}
+
+
+def test_favorites_batch(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    user, recipe = dataset['user'], dataset['new_recipe']
+    favorited = dataset['favorited_recipe']
+    ids = [recipe.id, favorited.id, MISSING_ID, recipe.id]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/recipes/favorite/', {'ids': ids}, format='json'
+        )
+    assert response.status_code == 200
+    assert statuses(response) == {
+        recipe.id: 201, favorited.id: 400, MISSING_ID: 404
+    }
+    assert Favorite.objects.filter(user=user, recipe=recipe).exists()
+    assert get_relations(user).has('favorites', recipe.id)
+    assert RecipeActivity.objects.get(recipe=recipe).favorites == 1
+    assert reconcile()['Recipe.favorites_count'] == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.delete(
+            '/api/recipes/favorite/', {'ids': ids}, format='json'
+        )
+    assert statuses(response) == {
+        recipe.id: 204, favorited.id: 204, MISSING_ID: 404
+    }
+    assert not Favorite.objects.filter(
+        user=user, recipe__in=(recipe, favorited)
+    ).exists()
+    assert not get_relations(user).has('favorites', favorited.id)
+    assert reconcile()['Recipe.favorites_count'] == 0
+
+
+def test_cart_batch_updates_shopping_list(dataset, user_client):
+    user = dataset['user']
+    ids = list(Recipe.objects.exclude(
+        cart__user=user
+    ).values_list('id', flat=True)[:3])
+    response = user_client.post(
+        '/api/recipes/shopping_cart/', {'ids': ids}, format='json'
+    )
+    assert set(statuses(response).values()) == {201}
+    assert ShoppingCart.objects.filter(user=user, recipe__in=ids).count() == 3
+    expected = shopping_list(user)
+    rebuild([user.id])
+    assert shopping_list(user) == expected
+
+    response = user_client.delete(
+        '/api/recipes/shopping_cart/', {'ids': ids[:2]}, format='json'
+    )
+    assert set(statuses(response).values()) == {204}
+    assert not get_relations(user).has('cart', ids[0])
+    expected = shopping_list(user)
+    rebuild([user.id])
+    assert shopping_list(user) == expected
+
+
+def test_subscribe_batch(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    user = dataset['user']
+    author, other_author = dataset['author'], dataset['other_author']
+    ids = [user.id, author.id, other_author.id]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/users/subscribe/', {'ids': ids}, format='json'
+        )
+    assert statuses(response) == {
+        user.id: 400, author.id: 400, other_author.id: 201
+    }
+    assert feed_ids(user_client) == expected_ids(user)
+    assert reconcile()['User.followers_count'] == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.delete(
+            '/api/users/subscribe/', {'ids': ids}, format='json'
+        )
+    assert statuses(response) == {
+        user.id: 400, author.id: 204, other_author.id: 204
+    }
+    assert feed_ids(user_client) == expected_ids(user)
+    assert reconcile()['User.followers_count'] == 0
+
+
+def test_batch_validation(user_client, anonymous_client):
+    response = user_client.post(
+        '/api/recipes/favorite/', {'ids': []}, format='json'
+    )
+    assert response.status_code == 400
+    response = anonymous_client.post(
+        '/api/recipes/favorite/', {'ids': [1]}, format='json'
+    )
+    assert response.status_code == 401
+
+
+def test_batch_counts_only_changed_rows(
+    dataset, monkeypatch, django_capture_on_commit_callbacks
+):
+    user, recipe = dataset['user'], dataset['new_recipe']
+    favorited = dataset['favorited_recipe']
+    ids = [recipe.id, favorited.id]
+    with django_capture_on_commit_callbacks(execute=True):
+        assert batch.add_favorites(user, ids) == {
+            recipe.id: batch.CREATED, favorited.id: batch.UNCHANGED
+        }
+        assert batch.add_favorites(user, ids) == {
+            recipe.id: batch.UNCHANGED, favorited.id: batch.UNCHANGED
+        }
+        # Параллельный запрос проверил связи до того, как их изменил
+        # этот.
+        monkeypatch.setattr(batch, 'current_links', lambda *args: {
+            pk: False for pk in ids
+        })
+        assert set(batch.add_favorites(user, ids).values()) == {
+            batch.UNCHANGED
+        }
+    assert reconcile()['Recipe.favorites_count'] == 0
+    monkeypatch.undo()
+    with django_capture_on_commit_callbacks(execute=True):
+        batch.remove_favorites(user, ids)
+        monkeypatch.setattr(batch, 'current_links', lambda *args: {
+            pk: True for pk in ids
+        })
+        assert set(batch.remove_favorites(user, ids).values()) == {
+            batch.UNCHANGED
+        }
+    assert reconcile()['Recipe.favorites_count'] == 0
+    assert RecipeActivity.objects.get(recipe=recipe).favorites == 0
@@ -0,0 +1,88 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.warmup import warm_up
+from recipes.models import Tag
+from users.models import User
+
+
+@pytest.mark.parametrize('url', ('/api/tags/', '/api/ingredients/',
+                                 '/api/recipes/', '/api/recipes/{recipe}/'))
+def test_not_modified_without_serializing(dataset, anonymous_client, url):
+    url = url.format(recipe=dataset['recipe'].id)
+    response = anonymous_client.get(url)
+    assert response.status_code == 200
+    assert response['Last-Modified']
+
+    with CaptureQueriesContext(connection) as context:
+        response = anonymous_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+    assert response.status_code == 304
+    assert len(context.captured_queries) == 1
+
+    response = anonymous_client.get(
+        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+    )
+    assert response.status_code == 304
+
+
+def test_etag_changes_with_data(dataset, anonymous_client, user_client):
+    etag = anonymous_client.get('/api/tags/')['ETag']
+    Tag.objects.create(name='Перекус', color='#000000', slug='snack')
+    response = anonymous_client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+    url = f'/api/recipes/{dataset["new_recipe"].id}/'
+    response = user_client.get(url)
+    assert 'Last-Modified' not in response
+    user_client.post(url + 'shopping_cart/')
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 200
+    assert response.data['is_in_shopping_cart']
+
+
+def test_reference_lists_are_cached(dataset, anonymous_client):
+    warm_up()
+    for url in ('/api/tags/', '/api/ingredients/?name=и'):
+        with CaptureQueriesContext(connection) as context:
+            response = anonymous_client.get(url)
+        assert response.status_code == 200
+        assert len(context.captured_queries) == 1
+        assert response.json()
+
+    Tag.objects.create(name='Перекус', color='#000000', slug='snack')
+    response = anonymous_client.get('/api/tags/')
+    assert 'snack' in [tag['slug'] for tag in response.json()]
+
+
+def test_other_users_relations_keep_etag(
+    dataset, anonymous_client, user_client
+):
+    url = f'/api/recipes/{dataset["new_recipe"].id}/'
+    anonymous_etag = anonymous_client.get(url)['ETag']
+    user_etag = user_client.get(url)['ETag']
+    other = APIClient()
+    other.force_authenticate(dataset['other_author'])
+    assert other.post(url + 'favorite/').status_code == 201
+    assert other.post(
+        f'/api/users/{dataset["author"].id}/subscribe/'
+    ).status_code == 201
+    for client, etag in ((anonymous_client, anonymous_etag),
+                         (user_client, user_etag)):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+
+def test_author_name_changes_etag(dataset, anonymous_client):
+    recipe = dataset['new_recipe']
+    url = f'/api/recipes/{recipe.id}/'
+    etag = anonymous_client.get(url)['ETag']
+    author = User.objects.get(pk=recipe.author_id)
+    author.first_name = 'Переименованный'
+    author.save(update_fields=('first_name',))
+    response = anonymous_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['author']['first_name'] == 'Переименованный'
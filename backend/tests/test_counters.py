@@ -0,0 +1,53 @@
+from jobs.models import Job
+from recipes.counters import reconcile
+from recipes.models import Favorite, Recipe
+from users.models import Subscription, User
+
+
+def test_counters_follow_changes(dataset, django_capture_on_commit_callbacks):
+    user, recipe = dataset['user'], dataset['new_recipe']
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.create(user=user, recipe=recipe)
+        Favorite.objects.filter(recipe=dataset['favorited_recipe']).delete()
+        Subscription.objects.create(
+            user=user, author=dataset['other_author']
+        )
+        Subscription.objects.filter(author=dataset['author']).delete()
+        Recipe.objects.create(
+            author=user, name='Ещё рецепт', text='Описание', cooking_time=1,
+            image=dataset['own_recipe'].image.name,
+        )
+        Recipe.objects.filter(pk=dataset['own_recipe'].pk).delete()
+
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
+    assert not any(reconcile().values())
+
+
+def test_counters_follow_user_deletion(
+    dataset, django_capture_on_commit_callbacks
+):
+    recipe = dataset['favorited_recipe']
+    favorites = Favorite.objects.filter(recipe=recipe).count()
+    with django_capture_on_commit_callbacks(execute=True):
+        # Копия: объекты набора данных общие для всех тестов.
+        User.objects.get(pk=dataset['user'].pk).delete()
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == favorites - 1
+    assert not any(reconcile().values())
+
+
+def test_favorite_changes_are_queued(dataset, settings):
+    settings.JOBS_EAGER = False
+    recipe = dataset['new_recipe']
+    Favorite.objects.create(user=dataset['user'], recipe=recipe)
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 0
+    assert list(Job.objects.values_list('name', 'args')) == [
+        ('recipes.tasks.apply_favorite_changes', [[recipe.id], 1])
+    ]
+    # Вместе с рецептом удаляется и его счётчик: задача не нужна.
+    Recipe.objects.filter(pk=recipe.pk).delete()
+    assert Job.objects.filter(
+        name='recipes.tasks.apply_favorite_changes'
+    ).count() == 1
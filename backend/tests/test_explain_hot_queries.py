@@ -0,0 +1,41 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.management.commands.explain_hot_queries import (SEQ_SCAN_PATTERNS,
+                                                         hot_queries)
+from recipes.models import Recipe
+
+
+def test_explain_hot_queries(dataset):
+    out = StringIO()
+    call_command('explain_hot_queries', stdout=out)
+    lines = out.getvalue().splitlines()
+    assert any(line.startswith('recipes-cursor: ') for line in lines)
+    assert any(line.startswith('cart-users: ') for line in lines)
+
+
+def test_hot_queries_without_recipes(dataset):
+    Recipe.objects.all().delete()
+    names = [name for name, _ in hot_queries()]
+    assert 'recipes-cursor' not in names
+    assert 'recipes-page' in names
+
+
+def test_index_scan_is_flagged_on_sqlite():
+    pattern = SEQ_SCAN_PATTERNS['sqlite']
+    assert [match['table'] for match in pattern.finditer(
+        'SCAN recipes_recipe USING INDEX recipe_created_id_idx'
+    )] == ['recipes_recipe']
+    assert pattern.search('SCAN recipes_favorite')
+    assert not pattern.search(
+        'SEARCH recipes_recipe USING INTEGER PRIMARY KEY (rowid=?)'
+    )
+
+
+def test_relation_filters_do_not_scan_recipes(dataset):
+    out = StringIO()
+    call_command('explain_hot_queries', '--fail', stdout=out)
+    lines = out.getvalue().splitlines()
+    assert 'recipes-favorited: ok' in lines
+    assert 'recipes-in-cart: ok' in lines
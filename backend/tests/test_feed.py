@@ -0,0 +1,71 @@
+from recipes import feed
+from recipes.models import FeedEntry, Recipe
+from tests.test_query_budget import recipe_payload
+from users.models import Subscription
+
+
+def feed_ids(client, url='/api/recipes/feed/?limit=7'):
+    ids = []
+    while url:
+        data = client.get(url).json()
+        ids += [recipe['id'] for recipe in data['results']]
+        url = data['next']
+    return ids
+
+
+def expected_ids(user):
+    return list(Recipe.objects.filter(
+        author__following__user=user
+    ).order_by('-created', '-id').values_list('id', flat=True))
+
+
+def test_feed_pages_follow_subscriptions(dataset, user_client):
+    ids = feed_ids(user_client)
+    assert ids == expected_ids(dataset['user'])
+    assert len(ids) == len(set(ids)) > 7
+
+
+def test_feed_updates_on_publish_and_subscribe(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    user, author = dataset['user'], dataset['author']
+    author_client = user_client.__class__()
+    author_client.force_authenticate(author)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            '/api/recipes/', data=recipe_payload(dataset), format='json'
+        )
+    assert response.status_code == 201, response.content
+    assert feed_ids(user_client)[0] == response.data['id']
+
+    other = dataset['other_author']
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(f'/api/users/{other.id}/subscribe/')
+    assert response.status_code == 201
+    assert feed_ids(user_client) == expected_ids(user)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.delete(f'/api/users/{author.id}/subscribe/')
+    assert response.status_code == 204
+    assert not FeedEntry.objects.filter(user=user, author=author).exists()
+    assert feed_ids(user_client) == expected_ids(user)
+
+
+def test_feed_is_trimmed(dataset, settings):
+    settings.FEED_MAX_ENTRIES = 5
+    settings.FEED_TRIM_SLACK = 2
+    user = dataset['user']
+    feed.rebuild([user.id])
+    kept = list(FeedEntry.objects.filter(user=user).order_by(
+        '-created', '-recipe_id'
+    ).values_list('recipe_id', flat=True))
+    assert kept == expected_ids(user)[:5]
+
+    author = Subscription.objects.filter(user=user).first().author
+    for number in range(3):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Новый {number}', text='Описание',
+            cooking_time=5, image=dataset['recipe'].image,
+        )
+        feed.fan_out(recipe.id)
+    assert FeedEntry.objects.filter(user=user).count() == 5
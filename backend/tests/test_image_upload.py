@@ -0,0 +1,61 @@
+from io import BytesIO
+
+from django.test import override_settings
+from PIL import Image
+
+from recipes.models import Recipe
+
+
+def png(width=4, height=3):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def put_image(client, recipe, content, **extra):
+    return client.put(
+        f'/api/recipes/{recipe.id}/image/', data=content,
+        content_type='image/png',
+        HTTP_CONTENT_DISPOSITION='attachment; filename="dish.png"', **extra
+    )
+
+
+def test_image_upload_replaces_image(dataset, user_client):
+    recipe = dataset['own_recipe']
+    old_image = recipe.image.name
+
+    response = put_image(user_client, recipe, png())
+
+    assert response.status_code == 200, response.content
+    assert response.data['image'].startswith('http://testserver/media/')
+    recipe.refresh_from_db()
+    assert recipe.image.name != old_image
+    assert (recipe.image.width, recipe.image.height) == (4, 3)
+
+
+def test_multipart_image_upload(dataset, user_client):
+    recipe = dataset['own_recipe']
+    image = BytesIO(png())
+    image.name = 'dish.png'
+
+    response = user_client.put(
+        f'/api/recipes/{recipe.id}/image/', data={'image': image},
+        format='multipart'
+    )
+
+    assert response.status_code == 200, response.content
+    assert Recipe.objects.get(pk=recipe.pk).image.name != recipe.image.name
+
+
+def test_image_upload_limits(dataset, user_client):
+    recipe = dataset['own_recipe']
+    with override_settings(MAX_IMAGE_UPLOAD_SIZE=10):
+        assert put_image(user_client, recipe, png()).status_code == 413
+    with override_settings(MAX_IMAGE_SIDE=3):
+        assert put_image(user_client, recipe, png()).status_code == 400
+    assert put_image(user_client, recipe, b'not an image').status_code == 400
+
+
+def test_image_upload_requires_author(dataset, user_client):
+    response = put_image(user_client, dataset['recipe'], png())
+    assert response.status_code == 403
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from recipes.images import SIZES, variant_name
+from recipes.models import Recipe
+from tests.test_query_budget import recipe_payload
+
+
+def test_variants_are_created_after_commit(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/recipes/', data=recipe_payload(dataset), format='json'
+        )
+    assert response.status_code == 201, response.content
+    assert response.data['image_srcset'] == {}
+
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image_variants['source'] == recipe.image.name
+    for variant in recipe.image_variants['sizes'].values():
+        assert default_storage.exists(variant['webp'])
+        assert default_storage.exists(variant['jpeg'])
+    assert recipe.image_variants['sizes'].keys() == SIZES.keys()
+
+    srcset = user_client.get(
+        f'/api/recipes/{recipe.id}/'
+    ).data['image_srcset']
+    assert srcset.keys() == {'webp', 'jpeg'}
+    assert srcset['webp'].startswith('http://testserver/media/')
+    assert srcset['webp'].endswith(' 1w')
+
+
+def test_variant_names_depend_on_extension():
+    assert variant_name('recipes/images/x.png', 'card', 'webp') != (
+        variant_name('recipes/images/x.jpg', 'card', 'webp')
+    )
+
+
+def test_replaced_image_variants_are_deleted(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/recipes/', data=recipe_payload(dataset), format='json'
+        )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    old = recipe.image_variants['sizes']
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.patch(
+            f'/api/recipes/{recipe.id}/', data=recipe_payload(dataset),
+            format='json'
+        )
+    assert response.status_code == 200, response.content
+    recipe.refresh_from_db()
+    new = recipe.image_variants['sizes']
+    for size, variant in old.items():
+        assert variant['webp'] != new[size]['webp']
+        assert not default_storage.exists(variant['webp'])
+        assert not default_storage.exists(variant['jpeg'])
+        assert default_storage.exists(new[size]['webp'])
+
+
+def test_make_image_variants_all_rewrites_files(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/recipes/', data=recipe_payload(dataset), format='json'
+        )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    names = [
+        variant[extension]
+        for variant in recipe.image_variants['sizes'].values()
+        for extension in ('webp', 'jpeg')
+    ]
+    for name in names:
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(b'stale'))
+    call_command('make_image_variants', stdout=StringIO())
+    with default_storage.open(names[0]) as file:
+        assert file.read() == b'stale'
+
+    call_command('make_image_variants', '--all', stdout=StringIO())
+    recipe.refresh_from_db()
+    assert [
+        variant[extension]
+        for variant in recipe.image_variants['sizes'].values()
+        for extension in ('webp', 'jpeg')
+    ] == names
+    for name in names:
+        with default_storage.open(name) as file:
+            assert file.read() != b'stale'
@@ -0,0 +1,57 @@
+import pytest
+from django.test import override_settings
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+NAMES = ('Пюре ежевика', 'Ежевика замороженная', 'Ёжевика дикая', 'Ежевика')
+
+
+@pytest.fixture
+def berries(dataset):
+    # Откат транзакции теста не сбрасывает индекс в памяти.
+    ingredient_index.invalidate()
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г') for name in NAMES
+    )
+    ingredient_index.invalidate()
+    yield
+    ingredient_index.invalidate()
+
+
+def names(prefix, **kwargs):
+    return [
+        entry['name'] for entry in ingredient_index.search(prefix, **kwargs)
+    ]
+
+
+def test_exact_then_name_prefix_then_word_prefix(berries, anonymous_client):
+    expected = [
+        'Ежевика', 'Ёжевика дикая', 'Ежевика замороженная', 'Пюре ежевика'
+    ]
+    assert names('ЕЖЕВИКА') == expected
+    assert names('ёжевика') == expected
+    response = anonymous_client.get('/api/ingredients/', {'name': 'ежевика'})
+    assert [entry['name'] for entry in response.data] == expected
+
+
+def test_search_is_truncated(berries):
+    assert len(names('ингредиент')) == 50
+    assert len(names('ингредиент', limit=None)) == 60
+    with override_settings(INGREDIENT_SEARCH_LIMIT=2):
+        assert names('ежевика') == ['Ежевика', 'Ёжевика дикая']
+
+
+def test_index_follows_ingredient_changes(berries):
+    ingredient = Ingredient.objects.get(name='Пюре ежевика')
+    ingredient.name = 'Пюре малиновое'
+    ingredient.save()
+    assert 'Пюре ежевика' not in names('ежевика')
+    assert names('пюре') == ['Пюре малиновое']
+    # Изменения в обход сигналов видны после INGREDIENT_INDEX_TTL.
+    Ingredient.objects.bulk_create([
+        Ingredient(name='Ежевика садовая', measurement_unit='г')
+    ])
+    assert 'Ежевика садовая' not in names('ежевика')
+    with override_settings(INGREDIENT_INDEX_TTL=0):
+        assert 'Ежевика садовая' in names('ежевика')
@@ -0,0 +1,68 @@
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, run, task
+
+CALLS = []
+
+
+@task(max_attempts=2)
+def record(value):
+    if value == 'fail':
+        raise ValueError(value)
+    CALLS.append(value)
+
+
+@pytest.fixture
+def queue(db):
+    CALLS.clear()
+    with override_settings(JOBS_EAGER=False):
+        yield
+
+
+def test_worker_runs_queued_jobs(queue):
+    record.enqueue_many((['a'],), delay=0)
+    record.enqueue('b', delay=60)
+
+    call_command('runworker', once=True, threads=1)
+
+    assert CALLS == ['a']
+    assert list(Job.objects.values_list('args', flat=True)) == [['b']]
+
+
+def test_failed_job_is_retried_then_marked_failed(queue):
+    record.enqueue('fail')
+    [job] = claim(10)
+    assert not run(job)
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.QUEUED, 1)
+    assert job.run_at > timezone.now()
+    assert 'ValueError' in job.last_error
+
+    Job.objects.update(run_at=timezone.now())
+    [job] = claim(10)
+    assert not run(job)
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.FAILED, 2)
+    assert claim(10) == []
+
+
+def test_expired_job_is_claimed_again(queue):
+    record.enqueue('a')
+    assert len(claim(10)) == 1
+    assert claim(10) == []
+    Job.objects.update(locked_until=timezone.now())
+    [job] = claim(10)
+    assert job.attempts == 2
+
+
+def test_eager_job_runs_on_commit(db, django_capture_on_commit_callbacks):
+    CALLS.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        record.enqueue('eager')
+        assert CALLS == []
+    assert CALLS == ['eager']
+    assert not Job.objects.exists()
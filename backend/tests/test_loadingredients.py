@@ -0,0 +1,95 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from api.management.commands import loadingredients
+from recipes.models import Ingredient
+
+ROWS = [
+    ('тестовая мука', 'г'),
+    ('тестовое молоко', 'мл'),
+    ('тестовое яйцо', 'шт.'),
+]
+
+
+def load(*args, stdin=None, monkeypatch=None):
+    if stdin is not None:
+        monkeypatch.setattr('sys.stdin', StringIO(stdin))
+    out = StringIO()
+    call_command('loadingredients', *args, stdout=out)
+    return out.getvalue().strip()
+
+
+def loaded():
+    return sorted(Ingredient.objects.filter(
+        name__startswith='тестов'
+    ).values_list('name', 'measurement_unit'))
+
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text(
+        ''.join(f'{name},{unit}\n' for name, unit in rows), encoding='utf-8'
+    )
+    return str(path)
+
+
+def as_json(rows):
+    return json.dumps(
+        [{'name': name, 'measurement_unit': unit} for name, unit in rows],
+        ensure_ascii=False, indent=1
+    )
+
+
+def test_rerun_is_idempotent(dataset, tmp_path):
+    path = write_csv(tmp_path, ROWS)
+    assert load(path) == 'Добавлено: 3, обновлено: 0, пропущено: 0'
+    assert load(path) == 'Добавлено: 0, обновлено: 0, пропущено: 3'
+    assert loaded() == sorted(ROWS)
+
+
+def test_update_changes_measurement_unit(dataset, tmp_path):
+    load(write_csv(tmp_path, ROWS))
+    path = write_csv(tmp_path, [('тестовое молоко', 'л')])
+    assert load(path, '--update') == (
+        'Добавлено: 0, обновлено: 1, пропущено: 0'
+    )
+    assert ('тестовое молоко', 'л') in loaded()
+    assert ('тестовое молоко', 'мл') not in loaded()
+
+
+def test_streamed_json_matches_csv(dataset, tmp_path, monkeypatch):
+    # Маленькие части проверяют разбор на границах чтения.
+    monkeypatch.setattr(loadingredients, 'READ_CHUNK_SIZE', 7)
+    path = tmp_path / 'ingredients.json'
+    path.write_text(as_json(ROWS + [(1, 2)]), encoding='utf-8')
+    assert load(str(path)) == 'Добавлено: 3, обновлено: 0, пропущено: 1'
+    assert loaded() == sorted(ROWS)
+
+
+def test_stdin(dataset, monkeypatch):
+    csv_rows = ''.join(f'{name},{unit}\n' for name, unit in ROWS[:2])
+    assert load('-', stdin=csv_rows, monkeypatch=monkeypatch) == (
+        'Добавлено: 2, обновлено: 0, пропущено: 0'
+    )
+    assert load(
+        '-', '--format', 'json', stdin=as_json(ROWS), monkeypatch=monkeypatch
+    ) == 'Добавлено: 1, обновлено: 0, пропущено: 2'
+    assert loaded() == sorted(ROWS)
+
+
+@pytest.mark.parametrize('content', (
+    '[{"name": "a", "measurement_unit": "г"}{"name": "b"}]',
+    '[,,{"name": "a", "measurement_unit": "г"}]',
+    '[{"name": "a", "measurement_unit": "г"},]',
+    '[{"name": "a", "measurement_unit": "г"},,{"name": "b"}]',
+    '[{"name": "a", "measurement_unit": "г"}',
+    '{"name": "a"}',
+))
+def test_malformed_json(dataset, tmp_path, content):
+    path = tmp_path / 'ingredients.json'
+    path.write_text(content, encoding='utf-8')
+    with pytest.raises(CommandError):
+        load(str(path))
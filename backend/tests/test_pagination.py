@@ -0,0 +1,22 @@
+from recipes.models import Recipe
+
+
+def test_cursor_pages_are_stable(dataset, anonymous_client):
+    expected = list(Recipe.objects.order_by('-created', '-id').values_list(
+        'id', flat=True
+    ))
+    url, seen = '/api/recipes/?cursor=&limit=7', []
+    while url:
+        response = anonymous_client.get(url)
+        assert response.status_code == 200
+        seen.extend(recipe['id'] for recipe in response.data['results'])
+        url = response.data['next']
+        if len(seen) == 7:
+            Recipe.objects.create(
+                author=dataset['author'], name='Новый', text='Описание',
+                cooking_time=1, image=dataset['own_recipe'].image.name,
+            )
+    assert seen == expected
+
+    response = anonymous_client.get('/api/recipes/?cursor=garbage')
+    assert response.status_code == 404
@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+import pytest
+
+from recipes import pantry
+from recipes.models import IngredientsRecipe
+from recipes.pantry import pantry_index
+from tests.test_query_budget import recipe_payload
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    # Откат транзакции теста не сбрасывает индекс в памяти.
+    pantry_index.invalidate()
+    yield
+    pantry_index.invalidate()
+
+
+def brute_force(ingredient_ids, max_missing):
+    ingredients = defaultdict(set)
+    for pk, ingredient in IngredientsRecipe.objects.values_list(
+        'recipe_id', 'ingredients_id'
+    ):
+        ingredients[pk].add(ingredient)
+    found = []
+    for pk, values in ingredients.items():
+        matched = len(values & ingredient_ids)
+        if matched and len(values) - matched <= max_missing:
+            found.append((pk, matched, len(values)))
+    return sorted(found, key=lambda item: (
+        item[2] - item[1], -item[1] / item[2], -item[0]
+    ))
+
+
+@pytest.mark.parametrize('dense_ratio', (1, pantry.DENSE_RATIO))
+def test_match_matches_brute_force(dataset, monkeypatch, dense_ratio):
+    # При DENSE_RATIO = 1 все множества хранятся массивами номеров.
+    monkeypatch.setattr(pantry, 'DENSE_RATIO', dense_ratio)
+    ingredient_ids = {
+        ingredient.id for ingredient in dataset['ingredients'][:12]
+    }
+    for max_missing in (0, 3, 10):
+        assert pantry_index.match(ingredient_ids, max_missing) == (
+            brute_force(ingredient_ids, max_missing)
+        )
+
+
+def test_pantry_endpoint(dataset, anonymous_client):
+    ingredients = dataset['ingredients'][:12]
+    pantry_ids = {ingredient.id for ingredient in ingredients}
+    response = anonymous_client.get('/api/recipes/pantry/', {
+        'ingredients': [ingredient.id for ingredient in ingredients],
+        'max_missing': 3,
+    })
+    assert response.status_code == 200
+    expected = brute_force(pantry_ids, 3)
+    assert expected
+    assert response.data['count'] == len(expected)
+    results = response.data['results']
+    assert [item['id'] for item in results] == [
+        pk for pk, _, _ in expected[:len(results)]
+    ]
+    for item, (_, matched, total) in zip(results, expected):
+        assert item['matched'] == matched
+        assert len(item['missing']) == total - matched
+        assert not {row['id'] for row in item['missing']} & pantry_ids
+    assert anonymous_client.get('/api/recipes/pantry/').status_code == 400
+
+
+def test_new_recipe_is_matched(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    ingredient = dataset['ingredients'][0]
+    assert pantry_index.match({ingredient.id}, 0) == []
+    payload = recipe_payload(dataset)
+    payload['ingredients'] = [{'id': ingredient.id, 'amount': 1}]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/recipes/', data=payload, format='json'
+        )
+    assert response.status_code == 201, response.content
+    assert pantry_index.match({ingredient.id}, 0) == [
+        (response.data['id'], 1, 1)
+    ]
@@ -0,0 +1,177 @@
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tests.conftest import BUDGET_RESULTS
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAA'
+    'DElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSuQmCC'
+)
+
+
+def recipe_payload(dataset):
+    return {
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in dataset['ingredients'][:10]
+        ],
+        'tags': [tag.id for tag in dataset['tags']],
+        'image': IMAGE,
+        'name': 'Новый рецепт',
+        'text': 'Описание нового рецепта',
+        'cooking_time': 15,
+    }
+
+
+# Объекты пакетных запросов: одна связь уже есть, двух ещё нет.
+BATCH_IDS = {
+    'recipes-favorite-batch': ('favorited_recipe', 'new_recipe',
+                               'own_recipe'),
+    'recipes-shopping-cart-batch': ('recipe', 'new_recipe', 'own_recipe'),
+    'users-subscribe-batch': ('author', 'other_author'),
+}
+
+
+# (название, метод, url, вызывающий, статус, бюджет запросов, бюджет мс)
+BUDGETS = (
+    ('recipes-list', 'get', '/api/recipes/', 'anon', 200, 5, 300),
+    ('recipes-list', 'get', '/api/recipes/', 'user', 200, 6, 300),
+    ('recipes-list-cursor', 'get', '/api/recipes/?cursor=', 'anon', 200, 4,
+     300),
+    ('recipes-list-cursor', 'get', '/api/recipes/?cursor=', 'user', 200, 5,
+     300),
+    ('recipes-list-filtered', 'get',
+     '/api/recipes/?tags=breakfast&tags=lunch&is_favorited=1', 'user',
+     200, 7, 300),
+    ('recipes-list-in-cart', 'get', '/api/recipes/?is_in_shopping_cart=1',
+     'user', 200, 6, 300),
+    ('recipes-search', 'get', '/api/recipes/?search=рецепт ингредиент',
+     'anon', 200, 5, 300),
+    ('recipes-search', 'get', '/api/recipes/?search=рецепт&tags=lunch',
+     'user', 200, 7, 300),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', 'anon', 200, 4, 200),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', 'user', 200, 5, 200),
+    ('recipes-create', 'post', '/api/recipes/', 'anon', 401, 0, 200),
+    ('recipes-create', 'post', '/api/recipes/', 'user', 201, 18, 500),
+    ('recipes-update', 'patch', '/api/recipes/{own_recipe}/', 'user',
+     200, 22, 500),
+    # Изменение связи: запросы самой связи, строка Job и две точки
+    # сохранения транзакции (в работе - BEGIN и COMMIT, их нет в счёте).
+    # Корзина ещё и обновляет сводный список покупок.
+    ('recipes-favorite', 'post', '/api/recipes/{new_recipe}/favorite/',
+     'user', 201, 7, 200),
+    ('recipes-favorite', 'delete',
+     '/api/recipes/{favorited_recipe}/favorite/', 'user', 204, 7, 200),
+    ('recipes-shopping-cart', 'post',
+     '/api/recipes/{new_recipe}/shopping_cart/', 'user', 201, 13, 200),
+    ('recipes-shopping-cart', 'delete',
+     '/api/recipes/{recipe}/shopping_cart/', 'user', 204, 12, 200),
+    ('recipes-favorite-batch', 'post', '/api/recipes/favorite/', 'user',
+     200, 6, 200),
+    ('recipes-favorite-batch', 'delete', '/api/recipes/favorite/', 'user',
+     200, 6, 200),
+    ('recipes-shopping-cart-batch', 'post', '/api/recipes/shopping_cart/',
+     'user', 200, 10, 200),
+    ('recipes-shopping-cart-batch', 'delete', '/api/recipes/shopping_cart/',
+     'user', 200, 11, 200),
+    ('recipes-download-shopping-cart', 'get',
+     '/api/recipes/download_shopping_cart/', 'anon', 401, 0, 200),
+    ('recipes-download-shopping-cart', 'get',
+     '/api/recipes/download_shopping_cart/', 'user', 200, 2, 200),
+    ('recipes-download-shopping-cart-csv', 'get',
+     '/api/recipes/download_shopping_cart/?format=csv', 'user', 200, 2, 200),
+    ('recipes-download-shopping-cart-json', 'get',
+     '/api/recipes/download_shopping_cart/?format=json', 'user', 200, 2,
+     200),
+    ('recipes-shopping-list', 'get', '/api/recipes/shopping_list/', 'anon',
+     401, 0, 200),
+    ('recipes-shopping-list', 'get', '/api/recipes/shopping_list/', 'user',
+     200, 2, 200),
+    ('recipes-trending', 'get', '/api/recipes/trending/', 'anon', 200, 5,
+     300),
+    ('recipes-popular', 'get', '/api/recipes/?ordering=popular', 'anon', 200,
+     5, 300),
+    ('recipes-similar', 'get', '/api/recipes/{recipe}/similar/', 'anon', 200,
+     4, 200),
+    ('recipes-pantry', 'get', '/api/recipes/pantry/?{pantry}', 'anon', 200,
+     6, 300),
+    ('recipes-feed', 'get', '/api/recipes/feed/', 'anon', 401, 0, 200),
+    ('recipes-feed', 'get', '/api/recipes/feed/', 'user', 200, 5, 300),
+    ('users-list', 'get', '/api/users/', 'anon', 200, 2, 200),
+    ('users-list', 'get', '/api/users/', 'user', 200, 3, 200),
+    ('users-detail', 'get', '/api/users/{author}/', 'user', 200, 2, 200),
+    ('users-me', 'get', '/api/users/me/', 'user', 200, 1, 200),
+    ('users-subscriptions', 'get',
+     '/api/users/subscriptions/?recipes_limit=3', 'anon', 401, 0, 200),
+    ('users-subscriptions', 'get',
+     '/api/users/subscriptions/?recipes_limit=3', 'user', 200, 4, 300),
+    ('users-subscribe', 'post', '/api/users/{other_author}/subscribe/',
+     'user', 201, 8, 200),
+    ('users-subscribe', 'delete', '/api/users/{author}/subscribe/',
+     'user', 204, 7, 200),
+    ('users-subscribe-batch', 'post', '/api/users/subscribe/', 'user', 200,
+     6, 200),
+    ('users-subscribe-batch', 'delete', '/api/users/subscribe/', 'user',
+     200, 6, 200),
+    ('tags-list', 'get', '/api/tags/', 'anon', 200, 2, 100),
+    ('tags-detail', 'get', '/api/tags/{tag}/', 'anon', 200, 2, 100),
+    ('ingredients-list', 'get', '/api/ingredients/', 'anon', 200, 2, 200),
+    ('ingredients-search', 'get', '/api/ingredients/?name=ингредиент 1',
+     'anon', 200, 1, 100),
+)
+
+
+@pytest.mark.parametrize(
+    'name, method, url, caller, expected_status, max_queries, max_ms',
+    BUDGETS,
+    ids=[f'{budget[0]}-{budget[1]}-{budget[3]}' for budget in BUDGETS],
+)
+def test_query_budget(request, dataset, settings, name, method, url, caller,
+                      expected_status, max_queries, max_ms):
+    # Задачи ставятся в очередь, как в работе: вставка строки Job входит
+    # в бюджет, а сама задача - нет.
+    settings.JOBS_EAGER = False
+    client = request.getfixturevalue(
+        'user_client' if caller == 'user' else 'anonymous_client'
+    )
+    url = url.format(
+        recipe=dataset['recipe'].id,
+        favorited_recipe=dataset['favorited_recipe'].id,
+        new_recipe=dataset['new_recipe'].id,
+        own_recipe=dataset['own_recipe'].id,
+        author=dataset['author'].id,
+        other_author=dataset['other_author'].id,
+        tag=dataset['tags'][0].id,
+        pantry='&'.join(
+            f'ingredients={ingredient.id}'
+            for ingredient in dataset['ingredients'][:12]
+        ),
+    )
+    data = None
+    if name in ('recipes-create', 'recipes-update'):
+        data = recipe_payload(dataset)
+    elif name in BATCH_IDS:
+        data = {'ids': [dataset[key].id for key in BATCH_IDS[name]]}
+    with CaptureQueriesContext(connection) as context:
+        started = time.perf_counter()
+        response = getattr(client, method)(url, data=data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+    queries = len(context.captured_queries)
+    BUDGET_RESULTS.append((
+        f'{method.upper()} {name}', caller, response.status_code,
+        queries, max_queries, elapsed, max_ms,
+    ))
+    assert response.status_code == expected_status, response.content
+    assert queries <= max_queries, (
+        f'{method.upper()} {url}: {queries} запросов при бюджете '
+        f'{max_queries}:\n'
+        + '\n'.join(query['sql'] for query in context.captured_queries)
+    )
+    assert elapsed <= max_ms, (
+        f'{method.upper()} {url}: {elapsed:.1f} мс при бюджете {max_ms} мс'
+    )
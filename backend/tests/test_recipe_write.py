@@ -0,0 +1,80 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientsRecipe, ShoppingListItem
+from recipes.shopping_list import add_to_cart
+from tests.test_query_budget import recipe_payload
+
+
+def create_queries(client, payload):
+    with CaptureQueriesContext(connection) as context:
+        response = client.post('/api/recipes/', data=payload, format='json')
+    assert response.status_code == 201, response.content
+    return len(context.captured_queries)
+
+
+def test_create_queries_do_not_depend_on_ingredients(dataset, user_client):
+    payload = recipe_payload(dataset)
+    few = create_queries(user_client, payload)
+    payload['ingredients'] = [
+        {'id': ingredient.id, 'amount': 1}
+        for ingredient in dataset['ingredients'][:30]
+    ]
+    assert create_queries(user_client, payload) == few
+
+
+def shopping_list(user, ingredients):
+    return dict(ShoppingListItem.objects.filter(
+        user=user, ingredient__in=ingredients
+    ).values_list('ingredient_id', 'total_amount'))
+
+
+def test_update_applies_ingredient_diff(dataset, user_client):
+    recipe, user = dataset['own_recipe'], dataset['user']
+    first, second, third = dataset['ingredients'][:3]
+    IngredientsRecipe.objects.bulk_create((
+        IngredientsRecipe(recipe=recipe, ingredients=first, amount=1),
+        IngredientsRecipe(recipe=recipe, ingredients=second, amount=2),
+    ))
+    add_to_cart(user, recipe)
+    before = shopping_list(user, (first, second, third))
+    kept = IngredientsRecipe.objects.get(recipe=recipe, ingredients=first)
+    payload = recipe_payload(dataset)
+    payload['ingredients'] = [
+        {'id': first.id, 'amount': 5}, {'id': third.id, 'amount': 3},
+    ]
+
+    response = user_client.patch(
+        f'/api/recipes/{recipe.id}/', data=payload, format='json'
+    )
+
+    assert response.status_code == 200, response.content
+    expected = {first.id: 5, third.id: 3}
+    assert {
+        item['id']: item['amount'] for item in response.data['ingredients']
+    } == expected
+    assert dict(IngredientsRecipe.objects.filter(recipe=recipe).values_list(
+        'ingredients_id', 'amount'
+    )) == expected
+    assert IngredientsRecipe.objects.filter(pk=kept.pk).exists()
+    after = shopping_list(user, (first, second, third))
+    assert after.get(first.id, 0) - before.get(first.id, 0) == 4
+    assert after.get(second.id, 0) - before.get(second.id, 0) == -2
+    assert after.get(third.id, 0) - before.get(third.id, 0) == 3
+
+
+def test_invalid_ingredients_are_rejected(dataset, user_client):
+    payload = recipe_payload(dataset)
+    ingredient = payload['ingredients'][0]
+    for ingredients in (
+        [ingredient, ingredient],
+        [{'id': 10 ** 6, 'amount': 1}],
+        [{'id': ingredient['id'], 'amount': 0}],
+        [],
+    ):
+        payload['ingredients'] = ingredients
+        response = user_client.post(
+            '/api/recipes/', data=payload, format='json'
+        )
+        assert response.status_code == 400
+        assert 'ingredients' in response.data
@@ -0,0 +1,20 @@
+def test_relations_follow_actions(dataset, user_client):
+    url = f'/api/recipes/{dataset["new_recipe"].id}/'
+    author_url = f'/api/users/{dataset["other_author"].id}/'
+    recipe = user_client.get(url).data
+    assert not recipe['is_favorited'] and not recipe['is_in_shopping_cart']
+    assert not user_client.get(author_url).data['is_subscribed']
+
+    user_client.post(url + 'favorite/')
+    user_client.post(url + 'shopping_cart/')
+    user_client.post(author_url + 'subscribe/')
+    recipe = user_client.get(url).data
+    assert recipe['is_favorited'] and recipe['is_in_shopping_cart']
+    assert user_client.get(author_url).data['is_subscribed']
+
+    user_client.delete(url + 'favorite/')
+    user_client.delete(url + 'shopping_cart/')
+    user_client.delete(author_url + 'subscribe/')
+    recipe = user_client.get(url).data
+    assert not recipe['is_favorited'] and not recipe['is_in_shopping_cart']
+    assert not user_client.get(author_url).data['is_subscribed']
@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from recipes import scores
+from recipes.models import Recipe, RecipeActivity, RecipeScore
+from recipes.tasks import apply_cart_changes
+
+
+def test_trending_follows_recent_activity(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    first, second = dataset['new_recipe'], dataset['own_recipe']
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.post(f'/api/recipes/{first.id}/shopping_cart/')
+        user_client.post(f'/api/recipes/{second.id}/favorite/')
+        user_client.post(f'/api/recipes/{second.id}/shopping_cart/')
+    assert RecipeActivity.objects.get(recipe=second).favorites == 1
+
+    url = '/api/recipes/?ordering=popular'
+    etag = user_client.get(url)['ETag']
+    assert scores.update() == 2
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+    ids = [recipe['id'] for recipe in response.data['results']]
+    popular = list(RecipeScore.objects.order_by(
+        '-popular', '-recipe_id'
+    ).values_list('recipe_id', flat=True)[:len(ids)])
+    assert ids == popular
+
+    response = user_client.get('/api/recipes/trending/')
+    assert [recipe['id'] for recipe in response.data['results']] == [
+        second.id, first.id
+    ]
+
+
+def test_scores_decay_and_leave_window(dataset):
+    now = timezone.now()
+    recent, old, expired = (
+        dataset['recipe'], dataset['new_recipe'], dataset['own_recipe']
+    )
+    RecipeActivity.objects.bulk_create((
+        RecipeActivity(recipe=recent, bucket=now, favorites=1),
+        RecipeActivity(recipe=old, bucket=now - scores.half_life(),
+                       favorites=1),
+        RecipeActivity(recipe=expired, bucket=now - scores.window()
+                       - timedelta(hours=1), favorites=5),
+    ))
+    RecipeScore.objects.filter(recipe=expired).update(trending=10)
+    scores.update()
+    trending = dict(RecipeScore.objects.values_list('recipe_id', 'trending'))
+    assert trending[old.id] / trending[recent.id] == pytest.approx(
+        0.5, rel=0.01
+    )
+    assert trending[expired.id] == 0
+    assert not RecipeActivity.objects.filter(recipe=expired).exists()
+
+
+def test_activity_of_deleted_recipe_is_skipped(dataset):
+    recipe = dataset['new_recipe']
+    Recipe.objects.filter(pk=recipe.pk).delete()
+    apply_cart_changes([recipe.id, dataset['recipe'].id], 1)
+    assert not RecipeActivity.objects.filter(recipe_id=recipe.id).exists()
+    assert RecipeActivity.objects.get(recipe=dataset['recipe']).carts == 1
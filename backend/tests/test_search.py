@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+
+from recipes.search import FTS_TABLE
+from tests.test_query_budget import recipe_payload
+
+
+def search(client, **params):
+    response = client.get('/api/recipes/', {'limit': 50, **params})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.fixture
+def hedgehog_recipes(dataset, user_client,
+                     django_capture_on_commit_callbacks):
+    """Рецепт со словом в названии и рецепт с ним только в описании."""
+    ids = []
+    for name, text, tags in (
+        ('Ёжиков пирог', 'Описание', dataset['tags']),
+        ('Салат', 'Подаётся с ежиковым соусом', dataset['tags'][:1]),
+    ):
+        payload = recipe_payload(dataset)
+        payload.update(
+            name=name, text=text, tags=[tag.id for tag in tags]
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            response = user_client.post(
+                '/api/recipes/', data=payload, format='json'
+            )
+        assert response.status_code == 201, response.content
+        ids.append(response.data['id'])
+    return ids
+
+
+def test_search_prefix_folding_and_relevance(
+    user_client, hedgehog_recipes
+):
+    assert search(user_client, search='ЕЖИК') == hedgehog_recipes
+    assert search(user_client, search='ёжиковым') == hedgehog_recipes[1:]
+    assert search(user_client, search='ежик пирог') == hedgehog_recipes[:1]
+
+
+def test_search_with_filters(dataset, user_client, hedgehog_recipes):
+    pie, salad = hedgehog_recipes
+    assert search(
+        user_client, search='ежик', author=dataset['user'].id
+    ) == [pie, salad]
+    assert search(
+        user_client, search='ежик', author=dataset['author'].id
+    ) == []
+    assert search(
+        user_client, search='ежик', tags=dataset['tags'][1].slug
+    ) == [pie]
+    assert search(user_client, search='ежик', is_favorited=1) == []
+    user_client.post(f'/api/recipes/{salad}/favorite/')
+    assert search(user_client, search='ежик', is_favorited=1) == [salad]
+
+
+def test_search_index_follows_edit_and_delete(
+    dataset, user_client, hedgehog_recipes,
+    django_capture_on_commit_callbacks
+):
+    pie, salad = hedgehog_recipes
+    payload = recipe_payload(dataset)
+    payload.update(name='Пирог с капустой', text='Описание')
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.patch(
+            f'/api/recipes/{pie}/', data=payload, format='json'
+        )
+    assert response.status_code == 200, response.content
+    assert search(user_client, search='ежик') == [salad]
+    assert search(user_client, search='капуст') == [pie]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.delete(f'/api/recipes/{salad}/')
+    assert response.status_code == 204
+    assert search(user_client, search='ежик') == []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE rowid = %s', [salad]
+        )
+        assert cursor.fetchone()[0] == 0
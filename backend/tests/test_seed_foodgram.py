@@ -0,0 +1,40 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import (FeedEntry, Recipe, RecipeScore, ShoppingCart,
+                            ShoppingListItem, SimilarRecipe)
+from recipes.pantry import pantry_index
+from users.models import Subscription
+
+
+def test_seed_rebuilds_derived_data(dataset):
+    existing = Recipe.objects.count()
+    call_command(
+        'seed_foodgram', '--users', '20', '--recipes', '40', '--tags', '3',
+        '--favorites', '100', '--carts', '30', '--subscriptions', '40',
+        stdout=StringIO()
+    )
+    assert Recipe.objects.count() == existing + 40
+    assert RecipeScore.objects.count() == existing + 40
+    # Рецепты, которые добавляли в избранное, попали в рейтинг.
+    assert not RecipeScore.objects.filter(
+        popular=0, recipe__favorites_count__gt=0
+    ).exists()
+    # В ленте каждого подписчика - рецепты авторов, на которых он подписан.
+    for user_id, author_id in Subscription.objects.values_list(
+        'user_id', 'author_id'
+    ):
+        assert FeedEntry.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).count() == Recipe.objects.filter(author_id=author_id).count()
+    assert SimilarRecipe.objects.exists()
+    assert set(ShoppingListItem.objects.values_list(
+        'user_id', flat=True
+    )) == set(ShoppingCart.objects.values_list('user_id', flat=True))
+    recipe = Recipe.objects.filter(name__startswith='Рецепт ').first()
+    ingredient_ids = set(recipe.ingredients.values_list('id', flat=True))
+    pantry_index.invalidate()
+    assert recipe.id in {
+        pk for pk, _, _ in pantry_index.match(ingredient_ids, 0)
+    }
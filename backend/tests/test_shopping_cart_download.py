@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+
+import pytest
+
+from api.renderers import BOM, ShoppingCartRenderer
+from recipes.models import ShoppingListItem
+
+
+def expected_rows(user):
+    return list(ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+    ))
+
+
+def download(client, file_format):
+    response = client.get(
+        '/api/recipes/download_shopping_cart/', {'format': file_format}
+    )
+    assert response.status_code == 200
+    assert response['Content-Disposition'] == (
+        f'attachment; filename="shopping_cart.{file_format}"'
+    )
+    return response, b''.join(response.streaming_content).decode()
+
+
+def test_download_txt(dataset, user_client):
+    response, body = download(user_client, 'txt')
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    rows = expected_rows(dataset['user'])
+    assert rows
+    assert body == BOM + ''.join(
+        f'{name} ({unit}) — {amount}\n' for name, unit, amount in rows
+    )
+
+
+def test_download_csv(dataset, user_client):
+    response, body = download(user_client, 'csv')
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    assert body.startswith(BOM)
+    assert list(csv.reader(io.StringIO(body[1:]))) == [
+        ['Ингредиент', 'Единица измерения', 'Количество'],
+        *([name, unit, str(amount)]
+          for name, unit, amount in expected_rows(dataset['user'])),
+    ]
+
+
+def test_download_json(dataset, user_client):
+    response, body = download(user_client, 'json')
+    assert response['Content-Type'] == 'application/json; charset=utf-8'
+    assert json.loads(body) == [
+        {'name': name, 'measurement_unit': unit, 'amount': amount}
+        for name, unit, amount in expected_rows(dataset['user'])
+    ]
+
+
+def test_download_empty_json(dataset, user_client):
+    ShoppingListItem.objects.filter(user=dataset['user']).delete()
+    _, body = download(user_client, 'json')
+    assert json.loads(body) == []
+
+
+def test_renderer_requires_stream():
+    with pytest.raises(TypeError):
+        ShoppingCartRenderer()
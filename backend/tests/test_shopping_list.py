@@ -0,0 +1,38 @@
+from recipes.models import IngredientsRecipe, ShoppingCart, ShoppingListItem
+from recipes.shopping_list import (add_to_cart, rebuild, recipe_amounts,
+                                   remove_from_cart, update_recipe)
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient_id', 'total_amount'
+    ))
+
+
+def test_shopping_list_follows_cart(dataset,
+                                    django_capture_on_commit_callbacks):
+    user, recipe = dataset['user'], dataset['new_recipe']
+    assert add_to_cart(user, recipe)
+    assert not add_to_cart(user, recipe)
+
+    old_amounts = recipe_amounts(recipe)
+    amounts = IngredientsRecipe.objects.filter(recipe=recipe)
+    amounts.filter(ingredients=dataset['ingredients'][1]).delete()
+    amounts.update(amount=100)
+    IngredientsRecipe.objects.create(
+        recipe=recipe, ingredients=dataset['ingredients'][-1], amount=7
+    )
+    update_recipe(recipe, old_amounts)
+
+    assert remove_from_cart(user, dataset['recipe'])
+    assert not remove_from_cart(user, dataset['recipe'])
+    # Удалённый рецепт вычитается из списков фоновой задачей.
+    with django_capture_on_commit_callbacks(execute=True):
+        ShoppingCart.objects.filter(user=user).exclude(
+            recipe=recipe
+        ).first().recipe.delete()
+
+    expected = shopping_list(user)
+    rebuild([user.id])
+    assert shopping_list(user) == expected
+    assert expected
@@ -0,0 +1,131 @@
+from collections import defaultdict
+from math import log1p, sqrt
+
+import pytest
+from django.conf import settings
+
+from recipes import similar
+from recipes.models import IngredientsRecipe, Recipe, SimilarRecipe
+from tests.test_query_budget import recipe_payload
+
+
+def brute_force(recipe_id):
+    ingredients, tags = defaultdict(set), defaultdict(set)
+    for pk, ingredient in IngredientsRecipe.objects.values_list(
+        'recipe_id', 'ingredients_id'
+    ):
+        ingredients[pk].add(ingredient)
+    for pk, tag in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'
+    ):
+        tags[pk].add(tag)
+    frequency = defaultdict(int)
+    for values in ingredients.values():
+        for ingredient in values:
+            frequency[ingredient] += 1
+    total = Recipe.objects.count()
+    weight = {pk: log1p(total / df) ** 2 for pk, df in frequency.items()}
+
+    def norm(pk):
+        return sqrt(sum(weight[ingredient] for ingredient in ingredients[pk]))
+
+    scores = {}
+    for pk in ingredients:
+        shared = ingredients[pk] & ingredients[recipe_id]
+        if pk == recipe_id or not shared:
+            continue
+        cosine = sum(weight[ingredient] for ingredient in shared) / (
+            norm(pk) * norm(recipe_id)
+        )
+        union = tags[pk] | tags[recipe_id]
+        jaccard = len(tags[pk] & tags[recipe_id]) / len(union) if union else 0
+        tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+        scores[pk] = (1 - tag_weight) * cosine + tag_weight * jaccard
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_neighbours_match_brute_force(dataset):
+    recipe = dataset['recipe']
+    matrix = similar.Matrix.load()
+    neighbours = matrix.neighbours(matrix.row(recipe.id))
+    expected = brute_force(recipe.id)[:settings.SIMILAR_RECIPES_TOP_K]
+    assert [pk for pk, _ in neighbours] == [pk for pk, _ in expected]
+    assert [score for _, score in neighbours] == pytest.approx(
+        [score for _, score in expected]
+    )
+    stored = list(SimilarRecipe.objects.filter(recipe=recipe).order_by(
+        '-score', 'similar_id'
+    ).values_list('similar_id', flat=True))
+    assert stored == [pk for pk, _ in neighbours]
+
+
+def test_similar_endpoint(dataset, anonymous_client):
+    recipe = dataset['recipe']
+    response = anonymous_client.get(f'/api/recipes/{recipe.id}/similar/')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data] == list(
+        SimilarRecipe.objects.filter(recipe=recipe).order_by(
+            '-score', 'similar_id'
+        ).values_list('similar_id', flat=True)
+    )
+    response = anonymous_client.get('/api/recipes/0/similar/')
+    assert response.status_code == 404
+
+
+def test_new_recipe_joins_neighbour_lists(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    recipe = dataset['recipe']
+    payload = recipe_payload(dataset)
+    payload['ingredients'] = [
+        {'id': pk, 'amount': 1} for pk in IngredientsRecipe.objects.filter(
+            recipe=recipe
+        ).values_list('ingredients_id', flat=True)
+    ]
+    payload['tags'] = list(recipe.tags.values_list('id', flat=True))
+    listed = SimilarRecipe.objects.filter(recipe=recipe).count()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post(
+            '/api/recipes/', data=payload, format='json'
+        )
+    assert response.status_code == 201, response.content
+    twin = response.data['id']
+    first = SimilarRecipe.objects.filter(recipe=recipe).order_by(
+        '-score'
+    ).first()
+    assert first.similar_id == twin
+    assert first.score == pytest.approx(1)
+    assert SimilarRecipe.objects.filter(
+        recipe_id=twin
+    ).order_by('-score').first().similar_id == recipe.id
+    assert SimilarRecipe.objects.filter(
+        recipe=recipe
+    ).count() == min(listed + 1, settings.SIMILAR_RECIPES_TOP_K)
+
+
+def test_tags_beyond_one_word_do_not_collide():
+    # Теги с номерами 0 и 64 попадают в разные слова маски.
+    pairs = [(1, 1), (2, 1)]
+    matrix = similar.Matrix(pairs, [(1, 0), (2, 64)], {1: 2}, 2)
+    assert matrix.neighbours(0) == [
+        (2, pytest.approx(1 - settings.SIMILAR_RECIPES_TAG_WEIGHT))
+    ]
+    matrix = similar.Matrix(pairs, [(1, 64), (2, 64)], {1: 2}, 2)
+    assert matrix.neighbours(0) == [(2, pytest.approx(1))]
+
+
+def test_refresh_uses_cached_frequencies(dataset, monkeypatch):
+    recipe = dataset['recipe']
+    similar.rebuild()
+    expected = list(SimilarRecipe.objects.filter(recipe=recipe).order_by(
+        '-score', 'similar_id'
+    ).values_list('similar_id', flat=True))
+
+    def document_frequencies():
+        raise AssertionError('частоты должны браться из кэша')
+
+    monkeypatch.setattr(similar, 'document_frequencies', document_frequencies)
+    similar.refresh(recipe.id)
+    assert list(SimilarRecipe.objects.filter(recipe=recipe).order_by(
+        '-score', 'similar_id'
+    ).values_list('similar_id', flat=True)) == expected
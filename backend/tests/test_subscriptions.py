@@ -0,0 +1,19 @@
+from api.serializers import SubscriptionSerializer
+from recipes.models import Recipe
+
+
+def test_zero_recipes_limit(dataset, user_client):
+    response = user_client.get('/api/users/subscriptions/?recipes_limit=0')
+    assert response.status_code == 200
+    assert response.data['results']
+    for author in response.data['results']:
+        assert author['recipes'] == []
+        assert author['is_subscribed'] is True
+
+    author = dataset['author']
+    assert SubscriptionSerializer(
+        author, context={'recipes_limit': 0}
+    ).data['recipes'] == []
+    assert len(SubscriptionSerializer(author).data['recipes']) == (
+        Recipe.objects.filter(author=author).count()
+    )
@@ -12,7 +12,10 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'date_joined',
+        'recipes_count',
+        'followers_count',
     )
+    readonly_fields = ('recipes_count', 'followers_count')
     search_fields = ('email', 'username', 'first_name', 'last_name')
     list_filter = ('email', 'username')
     empty_value_display = '-пусто-'
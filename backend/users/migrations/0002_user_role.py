@@ -0,0 +1,18 @@
+# Generated by Django 4.1.3 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('admin', 'admin'), ('user', 'user')], default='user', max_length=30, verbose_name='Роль'),
+        ),
+    ]
@@ -37,6 +37,14 @@ class User(AbstractUser):
         default=DEFAULT_USER_LEVEL,
         verbose_name='Роль'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+    )
 
     @property
     def is_admin(self):
@@ -75,3 +83,8 @@ class Subscription(models.Model):
                 fields=['author', 'user'], name="unique_following"
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'], name='subscription_user_author_idx'
+            )
+        ]